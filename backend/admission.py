@@ -0,0 +1,267 @@
+"""Admission control: per-user rate limits, per-route concurrency and load shedding.
+
+``AdmissionMiddleware`` decides before a request reaches the router whether
+it may run:
+
+* each ``telegram_username`` (from the ``/users/telegram/{name}`` path or
+  the ``X-Telegram-Username`` header) gets a token bucket of
+  ``ADMISSION_USER_RATE`` requests/sec with bursts of
+  ``ADMISSION_USER_BURST``; an empty bucket answers 429;
+* each route runs at most ``ADMISSION_ROUTE_CONCURRENCY`` requests at once
+  (overridable per route with ``ADMISSION_ROUTE_LIMITS``), with up to
+  ``ADMISSION_MAX_QUEUE`` more waiting for ``ADMISSION_QUEUE_TIMEOUT``
+  seconds; beyond that the request answers 503;
+* while the recent connection pool wait (a time-decayed average fed from
+  ``metrics.RequestStats``) is above ``ADMISSION_MAX_POOL_WAIT_MS``, new
+  requests answer 503 straight away instead of queueing for a connection.
+
+Rejections carry ``Retry-After`` and never reach an endpoint, so clients may
+retry them even for non-idempotent calls. Setting a limit to 0 disables it.
+Counters and gauges are registered with ``metrics.registry``.
+"""
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import math
+import os
+import time
+
+from starlette.routing import Match
+
+import metrics
+
+# Per-user token bucket
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "20"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "40"))
+# Concurrent requests per route, and requests allowed to queue behind them
+ADMISSION_ROUTE_CONCURRENCY = int(os.getenv("ADMISSION_ROUTE_CONCURRENCY", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1"))
+# Per-route overrides, e.g. "POST /users/bulk=1,GET /users/export=2"
+ADMISSION_ROUTE_LIMITS = os.getenv("ADMISSION_ROUTE_LIMITS", "")
+# Shed load while the recent average pool wait exceeds this many milliseconds
+ADMISSION_MAX_POOL_WAIT_MS = float(os.getenv("ADMISSION_MAX_POOL_WAIT_MS", "250"))
+
+USER_HEADER = b"x-telegram-username"
+USER_PATH_PREFIX = "/users/telegram/"
+# Probes and scrapes must keep working under overload
+EXEMPT_PATHS = frozenset({"/", "/health/live", "/health/ready", "/metrics"})
+# How quickly the pool wait average forgets old observations
+POOL_WAIT_DECAY_SECONDS = 1.0
+# Idle buckets are pruned once this many users are tracked
+MAX_TRACKED_USERS = 100_000
+
+def parse_route_limits(value: str) -> Dict[Tuple[str, str], int]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, limit = item.rpartition("=")
+        method, _, path = route.strip().partition(" ")
+        limits[(method.upper(), path.strip())] = int(limit)
+    return limits
+
+class TokenBuckets:
+    """One token bucket per key, refilled lazily when the key is seen."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = MAX_TRACKED_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[str, List[float]] = {}
+
+    def take(self, key: str, now: float) -> float:
+        """Take a token; return 0 if granted, else seconds until one is available."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now: float) -> None:
+        # A bucket that has refilled completely carries no state worth keeping
+        refill = self.burst / self.rate
+        self._buckets = {key: b for key, b in self._buckets.items() if now - b[1] < refill}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class RouteLimiter:
+    """Concurrency limit for one route with a bounded, time-limited wait queue."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit) if limit > 0 else None
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; return the rejection reason if none was granted."""
+        if self._slots is None:
+            self.in_flight += 1
+            return None
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                return "queue_full"
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return "queue_timeout"
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+class DecayingAverage:
+    """Exponentially weighted average that decays towards 0 with time, not samples.
+
+    While load is shed no new samples arrive, so decaying with time is what
+    lets requests back in once the pool has drained.
+    """
+
+    def __init__(self, decay_seconds: float):
+        self.decay_seconds = decay_seconds
+        self.value = 0.0
+        self.updated = time.monotonic()
+
+    def read(self, now: float) -> float:
+        return self.value * math.exp(-(now - self.updated) / self.decay_seconds)
+
+    def add(self, sample: float, now: float) -> None:
+        weight = math.exp(-(now - self.updated) / self.decay_seconds)
+        self.value = self.value * weight + sample * (1 - weight)
+        self.updated = now
+
+rejected_total = metrics.registry.register(metrics.Counter(
+    "admission_rejected_total", "Requests refused by admission control, by reason.", metrics.ROUTE_LABELS + ("reason",)))
+
+class AdmissionMiddleware:
+    def __init__(
+        self,
+        app,
+        routes: list,
+        user_rate: float = ADMISSION_USER_RATE,
+        user_burst: float = ADMISSION_USER_BURST,
+        route_concurrency: int = ADMISSION_ROUTE_CONCURRENCY,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        route_limits: Optional[Dict[Tuple[str, str], int]] = None,
+        max_pool_wait_ms: float = ADMISSION_MAX_POOL_WAIT_MS,
+    ):
+        self.app = app
+        # The router's own list, so routes registered after the middleware are seen
+        self.routes = routes
+        self.buckets = TokenBuckets(user_rate, user_burst) if user_rate > 0 else None
+        self.route_concurrency = route_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.route_limits = parse_route_limits(ADMISSION_ROUTE_LIMITS) if route_limits is None else route_limits
+        self.max_pool_wait = max_pool_wait_ms / 1000
+        self.pool_wait = DecayingAverage(POOL_WAIT_DECAY_SECONDS)
+        self.limiters: Dict[Tuple[str, str], RouteLimiter] = {}
+
+        registry = metrics.registry
+        registry.register(metrics.Gauge(
+            "admission_in_flight", "Requests running, by route.", self._read("in_flight"), metrics.ROUTE_LABELS))
+        registry.register(metrics.Gauge(
+            "admission_waiting", "Requests queued for a route slot, by route.", self._read("waiting"), metrics.ROUTE_LABELS))
+        registry.register(metrics.Gauge(
+            "admission_pool_wait_seconds", "Recent average connection pool wait used for shedding.",
+            lambda: self.pool_wait.read(time.monotonic())))
+        registry.register(metrics.Gauge(
+            "admission_tracked_users", "Users with a rate-limit bucket.",
+            lambda: len(self.buckets) if self.buckets is not None else None))
+
+    def _read(self, attribute: str):
+        return lambda: {key: getattr(limiter, attribute) for key, limiter in self.limiters.items()}
+
+    def _match(self, scope) -> Optional[object]:
+        for route in self.routes:
+            match, child_scope = route.matches(scope)
+            if match is Match.FULL:
+                return route
+        return None
+
+    def _limiter(self, key: Tuple[str, str]) -> RouteLimiter:
+        limiter = self.limiters.get(key)
+        if limiter is None:
+            limit = self.route_limits.get(key, self.route_concurrency)
+            limiter = self.limiters[key] = RouteLimiter(limit, self.max_queue, self.queue_timeout)
+        return limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        route = self._match(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        # Let the metrics middleware label rejected requests with their route
+        scope["route"] = route
+        labels = (scope["method"], route.path)
+        now = time.monotonic()
+
+        username = self._username(scope)
+        if self.buckets is not None and username:
+            wait = self.buckets.take(username, now)
+            if wait:
+                await self._reject(send, labels, "rate_limited", 429, "Too many requests", wait)
+                return
+
+        if self.max_pool_wait and self.pool_wait.read(now) > self.max_pool_wait:
+            await self._reject(send, labels, "pool_wait", 503, "Database overloaded", 1)
+            return
+
+        limiter = self._limiter(labels)
+        reason = await limiter.acquire()
+        if reason is not None:
+            await self._reject(send, labels, reason, 503, "Server busy", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+            stats = metrics.current_stats()
+            if stats is not None and stats.queries:
+                self.pool_wait.add(stats.pool_wait_seconds, time.monotonic())
+
+    @staticmethod
+    def _username(scope) -> Optional[str]:
+        path = scope["path"]
+        if path.startswith(USER_PATH_PREFIX):
+            return path[len(USER_PATH_PREFIX):].split("/", 1)[0] or None
+        for name, value in scope["headers"]:
+            if name == USER_HEADER:
+                return value.decode("latin-1") or None
+        return None
+
+    async def _reject(self, send, labels: Tuple[str, str], reason: str, status: int, detail: str, retry_after: float) -> None:
+        rejected_total.inc(*labels, reason)
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,191 @@
+"""In-process grid index of profile locations for "nearby" lookups.
+
+Locations are projected onto a flat grid of ``GEO_CELL_METRES`` square cells
+(equirectangular around ``GEO_REFERENCE_LATITUDE``). A radius query visits
+the occupied cells that overlap the query circle nearest first, measures
+exact haversine distances for the profiles in them and stops as soon as no
+remaining cell can hold a closer profile than the ``limit`` already found,
+so its cost grows with the number of nearby profiles rather than the table
+size. Age and gender are kept next to each point so
+filters apply before any row is fetched; inactive profiles are left out.
+
+Like ``match_index.MatchIndex``, each worker builds the index at startup
+and keeps it in sync on every write path. ``CAMPUS_HALLS`` maps the hall
+names offered at registration to approximate coordinates.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import heapq
+import math
+import os
+import threading
+
+EARTH_RADIUS_METRES = 6_371_000.0
+GEO_CELL_METRES = float(os.getenv("GEO_CELL_METRES", "250"))
+# Latitude the grid is projected around (NTU)
+GEO_REFERENCE_LATITUDE = float(os.getenv("GEO_REFERENCE_LATITUDE", "1.348"))
+# Distances are rounded so keyset cursors compare equal across requests
+DISTANCE_DIGITS = 2
+
+# Approximate hall coordinates on the NTU campus (latitude, longitude)
+CAMPUS_HALLS: Dict[str, Tuple[float, float]] = {
+    "Hall 1": (1.3455, 103.6875),
+    "Hall 2": (1.3479, 103.6856),
+    "Hall 3": (1.3513, 103.6810),
+    "Hall 4": (1.3441, 103.6852),
+    "Hall 5": (1.3459, 103.6807),
+    "Hall 6": (1.3487, 103.6868),
+    "Hall 7": (1.3531, 103.6820),
+    "Hall 8": (1.3475, 103.6889),
+    "Hall 9": (1.3520, 103.6854),
+    "Hall 10": (1.3541, 103.6844),
+    "Hall 11": (1.3548, 103.6860),
+    "Hall 12": (1.3516, 103.6804),
+    "Hall 13": (1.3525, 103.6810),
+    "Hall 14": (1.3530, 103.6829),
+    "Hall 15": (1.3522, 103.6842),
+    "Hall 16": (1.3505, 103.6817),
+    "Crescent Hall": (1.3489, 103.6885),
+    "Pioneer Hall": (1.3465, 103.6888),
+    "Binjai Hall": (1.3551, 103.6818),
+    "Tanjong Hall": (1.3558, 103.6829),
+    "Banyan Hall": (1.3547, 103.6808),
+    "Saraca Hall": (1.3565, 103.6842),
+    "Tamarind Hall": (1.3570, 103.6832),
+    "Graduate Hall 1": (1.3537, 103.6870),
+    "Graduate Hall 2": (1.3544, 103.6876),
+}
+
+def haversine_metres(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METRES * math.asin(min(1.0, math.sqrt(a)))
+
+class GeoIndex:
+    def __init__(self, cell_metres: float = GEO_CELL_METRES, reference_latitude: float = GEO_REFERENCE_LATITUDE):
+        self.cell_metres = cell_metres
+        # Metres per degree along each axis of the projected grid
+        self._y_scale = math.radians(1) * EARTH_RADIUS_METRES
+        self._x_scale = self._y_scale * math.cos(math.radians(reference_latitude))
+        self._lock = threading.RLock()
+        # username -> (latitude, longitude, age, gender, cell)
+        self.points: Dict[str, Tuple[float, float, int, str, Tuple[int, int]]] = {}
+        self.cells: Dict[Tuple[int, int], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    # Writes
+
+    def build(self, rows: Iterable[Tuple[str, Optional[float], Optional[float], int, str, bool]]) -> None:
+        """Replace the contents with ``(username, latitude, longitude, age, gender, is_active)`` rows."""
+        with self._lock:
+            self.points = {}
+            self.cells = {}
+            for row in rows:
+                self.upsert(*row)
+
+    def upsert(
+        self,
+        telegram_username: str,
+        latitude: Optional[float],
+        longitude: Optional[float],
+        age: int,
+        gender: str,
+        is_active: bool = True,
+    ) -> None:
+        """Insert or move a profile; profiles without a location or inactive ones are dropped."""
+        with self._lock:
+            self.remove(telegram_username)
+            if latitude is None or longitude is None or not is_active:
+                return
+            cell = self._cell(latitude, longitude)
+            self.points[telegram_username] = (latitude, longitude, age, gender, cell)
+            self.cells.setdefault(cell, set()).add(telegram_username)
+
+    def remove(self, telegram_username: str) -> None:
+        with self._lock:
+            point = self.points.pop(telegram_username, None)
+            if point is None:
+                return
+            members = self.cells[point[4]]
+            members.discard(telegram_username)
+            if not members:
+                del self.cells[point[4]]
+
+    # Queries
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_metres: float,
+        limit: int,
+        min_age: Optional[int] = None,
+        max_age: Optional[int] = None,
+        gender: Optional[str] = None,
+        exclude: Optional[str] = None,
+        after: Optional[Tuple[float, str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """Up to ``limit`` ``(username, metres)`` pairs within the radius, nearest first, after the ``(metres, username)`` cursor."""
+        # Bounding box in degrees (longitude degrees shrink away from the equator), then grid cells
+        latitude_span = radius_metres / self._y_scale
+        longitude_span = radius_metres / (self._y_scale * max(math.cos(math.radians(latitude)), 1e-6))
+        low_x, low_y = self._cell(latitude - latitude_span, longitude - longitude_span)
+        high_x, high_y = self._cell(latitude + latitude_span, longitude + longitude_span)
+        x, y = self._project(latitude, longitude)
+        # Projected east-west metres are true metres at the reference latitude only
+        x_factor = math.cos(math.radians(latitude)) / (self._x_scale / self._y_scale)
+
+        found = []
+        # Max-heap (negated) of the ``limit`` smallest distances so far
+        best: List[float] = []
+        with self._lock:
+            cells = []
+            for cell_x in range(low_x, high_x + 1):
+                for cell_y in range(low_y, high_y + 1):
+                    if (cell_x, cell_y) in self.cells:
+                        cells.append((self._cell_distance(x, y, cell_x, cell_y, x_factor), cell_x, cell_y))
+            # Nearest cells first; stop once no remaining cell can hold a closer profile
+            cells.sort()
+            for cell_distance, cell_x, cell_y in cells:
+                if cell_distance > radius_metres or (len(best) == limit and cell_distance > -best[0]):
+                    break
+                for username in self.cells[(cell_x, cell_y)]:
+                    point_latitude, point_longitude, age, point_gender, _ = self.points[username]
+                    if username == exclude:
+                        continue
+                    if (min_age is not None and age < min_age) or (max_age is not None and age > max_age):
+                        continue
+                    if gender is not None and point_gender != gender:
+                        continue
+                    distance = round(haversine_metres(latitude, longitude, point_latitude, point_longitude), DISTANCE_DIGITS)
+                    if distance > radius_metres:
+                        continue
+                    if after is None or distance > after[0] or (distance == after[0] and username > after[1]):
+                        found.append((distance, username))
+                        heapq.heappush(best, -distance)
+                        if len(best) > limit:
+                            heapq.heappop(best)
+        return [(username, distance) for distance, username in heapq.nsmallest(limit, found)]
+
+    # Internals
+
+    def _project(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        return longitude * self._x_scale, latitude * self._y_scale
+
+    def _index(self, metres: float) -> int:
+        return math.floor(metres / self.cell_metres)
+
+    def _cell_distance(self, x: float, y: float, cell_x: int, cell_y: int, x_factor: float) -> float:
+        """Lower bound on the distance in metres from ``(x, y)`` to any point in a cell."""
+        size = self.cell_metres
+        dx = max(cell_x * size - x, 0.0, x - (cell_x + 1) * size) * x_factor
+        dy = max(cell_y * size - y, 0.0, y - (cell_y + 1) * size)
+        # Small margin for the flat projection against haversine distances
+        return math.hypot(dx, dy) * 0.995
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        x, y = self._project(latitude, longitude)
+        return self._index(x), self._index(y)
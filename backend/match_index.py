@@ -0,0 +1,246 @@
+"""In-memory, incrementally maintained index of match candidates.
+
+Every active profile occupies one row of a set of parallel NumPy arrays
+(hashed term columns and values, IDF-weighted values and norms, age, gender,
+flags). Writes re-featurize only the affected row; deleted rows go on a free
+list and are reused. Queries score all rows with the vectorized functions in
+``matching`` without touching the database.
+
+The arrays can be snapshotted to ``.npy`` files and memory-mapped back in
+(copy-on-write) so a restarted worker only has to replay rows written since
+the snapshot. Each worker process keeps its own index and sees its own
+writes immediately; writes made by other workers are picked up on restart.
+"""
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import matching
+from matching import HASH_DIM, MAX_TERMS
+
+# Array name -> (dtype, trailing shape)
+_ARRAYS = {
+    "cols": (np.int32, (MAX_TERMS,)),
+    "vals": (np.float32, (MAX_TERMS,)),
+    "weighted": (np.float32, (MAX_TERMS,)),
+    "norms": (np.float32, ()),
+    "ages": (np.int16, ()),
+    "genders": (np.int8, ()),
+    "active": (np.bool_, ()),
+    "live": (np.bool_, ()),
+}
+
+# Arrays persisted in snapshots; the rest are derived on load
+_SNAPSHOT_ARRAYS = ("cols", "vals", "ages", "genders", "active")
+
+class MatchIndex:
+    def __init__(self, capacity: int = 1024, idf_refresh_ratio: float = 0.05):
+        # Re-weight all rows once the live row count drifts this far from the IDF's
+        self.idf_refresh_ratio = idf_refresh_ratio
+        self._lock = threading.RLock()
+        self._allocate(capacity)
+        self.usernames: List[Optional[str]] = []
+        self.slots = {}
+        self._free: List[int] = []
+        self.df = np.zeros(HASH_DIM, dtype=np.float32)
+        self.n_docs = 0
+        self._idf_docs = 0
+        self.idf = matching.inverse_document_frequencies(self.df, 0)
+        self.ready = False
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def __contains__(self, telegram_username: str) -> bool:
+        return telegram_username in self.slots
+
+    # Writes
+
+    def build(self, rows: Iterable[Tuple[str, int, str, Optional[str], Optional[str], bool]]) -> None:
+        """Replace the index contents with ``(username, age, gender, hobby, description, is_active)`` rows."""
+        rows = list(rows)
+        cols, vals = matching.build_features((hobby, description) for _, _, _, hobby, description, _ in rows)
+        with self._lock:
+            self._allocate(max(len(rows), 1024))
+            n = len(rows)
+            self.cols[:n] = cols
+            self.vals[:n] = vals
+            self.ages[:n] = [row[1] for row in rows]
+            self.genders[:n] = [matching.gender_code(row[2]) for row in rows]
+            self.active[:n] = [bool(row[5]) for row in rows]
+            self.live[:n] = True
+            self.usernames = [row[0] for row in rows]
+            self.slots = {username: slot for slot, username in enumerate(self.usernames)}
+            self._free = []
+            self._rebuild_derived()
+            self.ready = True
+
+    def upsert(
+        self,
+        telegram_username: str,
+        age: int,
+        gender: Optional[str],
+        hobby: Optional[str],
+        description: Optional[str],
+        is_active: bool = True,
+    ) -> None:
+        """Insert or re-featurize a single profile."""
+        cols, vals = matching.hash_features(hobby, description)
+        with self._lock:
+            slot = self.slots.get(telegram_username)
+            if slot is None:
+                slot = self._claim_slot(telegram_username)
+            else:
+                self._remove_df(slot)
+
+            self.cols[slot] = cols
+            self.vals[slot] = vals
+            self.ages[slot] = age
+            self.genders[slot] = matching.gender_code(gender)
+            self.active[slot] = is_active
+            self.df[cols[vals > 0]] += 1
+            self._reweight(slot)
+            self._maybe_refresh_idf()
+
+    def remove(self, telegram_username: str) -> None:
+        with self._lock:
+            slot = self.slots.pop(telegram_username, None)
+            if slot is None:
+                return
+            self._remove_df(slot)
+            self.live[slot] = False
+            self.vals[slot] = 0
+            self.usernames[slot] = None
+            self._free.append(slot)
+            self.n_docs -= 1
+            self._maybe_refresh_idf()
+
+    # Queries
+
+    def top_matches(
+        self,
+        telegram_username: str,
+        age: int,
+        hobby: Optional[str],
+        description: Optional[str],
+        preferred_gender: int = 0,
+        k: int = 10,
+    ) -> List[Tuple[str, float]]:
+        """Best ``k`` active candidates for a requester, best first."""
+        query_cols, query_vals = matching.hash_features(hobby, description)
+        with self._lock:
+            n = len(self.usernames)
+            query, query_norm = matching.query_vector(query_cols, query_vals, self.idf)
+            eligible = self.live[:n] & self.active[:n]
+            slot = self.slots.get(telegram_username)
+            if slot is not None:
+                eligible[slot] = False
+            scores = matching.score_candidates(
+                query, query_norm, age,
+                self.cols[:n], self.weighted[:n], self.norms[:n], self.ages[:n], self.genders[:n],
+                preferred_gender=preferred_gender,
+                eligible=eligible,
+            )
+            return matching.rank(self.usernames, scores, matching.top_k(scores, k))
+
+    # Snapshots
+
+    def save(self, path: str) -> None:
+        """Write a snapshot directory atomically (written aside, then swapped in)."""
+        with self._lock:
+            n = len(self.usernames)
+            arrays = {name: np.array(getattr(self, name)[:n]) for name in _SNAPSHOT_ARRAYS}
+            usernames = list(self.usernames)
+            taken_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        staging = f"{path}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"taken_at": taken_at.isoformat(), "usernames": usernames}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+
+    def load(self, path: str) -> Optional[datetime]:
+        """Memory-map a snapshot; returns when it was taken, or ``None`` if absent."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+        with self._lock:
+            # Copy-on-write maps: pages are shared with the file until a row is updated
+            for name in _SNAPSHOT_ARRAYS:
+                setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="c"))
+            n = len(meta["usernames"])
+            self.usernames = meta["usernames"]
+            self.slots = {username: slot for slot, username in enumerate(self.usernames) if username is not None}
+            self._free = [slot for slot, username in enumerate(self.usernames) if username is None]
+            self.live = np.array([username is not None for username in self.usernames], dtype=np.bool_)
+            self.weighted = np.zeros((n, MAX_TERMS), dtype=np.float32)
+            self.norms = np.zeros(n, dtype=np.float32)
+            self._rebuild_derived()
+            self.ready = True
+        return datetime.fromisoformat(meta["taken_at"])
+
+    # Internals
+
+    def _allocate(self, capacity: int) -> None:
+        for name, (dtype, shape) in _ARRAYS.items():
+            setattr(self, name, np.zeros((capacity,) + shape, dtype=dtype))
+
+    def _grow(self) -> None:
+        capacity = max(1024, 2 * len(self.ages))
+        for name, (dtype, shape) in _ARRAYS.items():
+            grown = np.zeros((capacity,) + shape, dtype=dtype)
+            current = getattr(self, name)
+            grown[: len(current)] = current
+            setattr(self, name, grown)
+
+    def _claim_slot(self, telegram_username: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self.usernames[slot] = telegram_username
+        else:
+            slot = len(self.usernames)
+            if slot >= len(self.ages):
+                self._grow()
+            self.usernames.append(telegram_username)
+        self.slots[telegram_username] = slot
+        self.live[slot] = True
+        self.n_docs += 1
+        return slot
+
+    def _remove_df(self, slot: int) -> None:
+        cols, vals = self.cols[slot], self.vals[slot]
+        self.df[cols[vals > 0]] -= 1
+
+    def _reweight(self, slot: int) -> None:
+        weighted = self.vals[slot] * self.idf[self.cols[slot]]
+        self.weighted[slot] = weighted
+        self.norms[slot] = np.sqrt(np.dot(weighted, weighted))
+
+    def _maybe_refresh_idf(self) -> None:
+        if abs(self.n_docs - self._idf_docs) > self.idf_refresh_ratio * max(self._idf_docs, 1):
+            self._refresh_idf()
+
+    def _refresh_idf(self) -> None:
+        n = len(self.usernames)
+        self.idf = matching.inverse_document_frequencies(self.df, self.n_docs)
+        self.weighted[:n], self.norms[:n] = matching.weight_rows(self.cols[:n], self.vals[:n], self.idf)
+        self._idf_docs = self.n_docs
+
+    def _rebuild_derived(self) -> None:
+        n = len(self.usernames)
+        live = self.live[:n]
+        self.n_docs = int(live.sum())
+        self.df = matching.document_frequencies(self.cols[:n][live], self.vals[:n][live])
+        self._refresh_idf()
@@ -0,0 +1,156 @@
+"""Vectorized candidate scoring for /match.
+
+Profiles are turned into hashed TF-IDF vectors over ``hobby`` and
+``description``. Each row keeps at most ``MAX_TERMS`` (column, weight) pairs
+in two fixed-width arrays, so scoring one requester against every candidate
+is a gather, a multiply and a row sum over ``N x MAX_TERMS`` elements with
+no Python loop over users. ``match_index.MatchIndex`` keeps these arrays
+up to date between requests.
+"""
+from typing import Iterable, Optional, Sequence, Tuple
+import re
+import zlib
+
+import numpy as np
+
+# Size of the hashed vocabulary and terms kept per profile
+HASH_DIM = 1 << 18
+MAX_TERMS = 32
+
+# Hobby terms count more than free-text description terms
+HOBBY_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Blend of the score components and the age decay scale (years)
+TEXT_WEIGHT = 0.6
+AGE_WEIGHT = 0.4
+AGE_SCALE = 3.0
+
+GENDER_CODES = {"male": 1, "female": 2}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> list:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def gender_code(gender: Optional[str]) -> int:
+    """Small integer code for a gender string (0 for anything unrecognised)."""
+    return GENDER_CODES.get((gender or "").strip().lower(), 0)
+
+def hash_features(hobby: Optional[str], description: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed, sublinear term frequencies for one profile, padded to ``MAX_TERMS``.
+
+    CRC32 is used instead of ``hash()`` so vectors are stable across processes.
+    """
+    counts = {}
+    for tokens, weight in ((tokenize(hobby), HOBBY_WEIGHT), (tokenize(description), DESCRIPTION_WEIGHT)):
+        for token in tokens:
+            column = zlib.crc32(token.encode()) & (HASH_DIM - 1)
+            counts[column] = counts.get(column, 0.0) + weight
+
+    cols = np.zeros(MAX_TERMS, dtype=np.int32)
+    vals = np.zeros(MAX_TERMS, dtype=np.float32)
+    top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:MAX_TERMS]
+    for i, (column, count) in enumerate(top):
+        cols[i] = column
+        vals[i] = 1.0 + np.log(count)
+    return cols, vals
+
+def build_features(profiles: Iterable[Tuple[Optional[str], Optional[str]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack ``hash_features`` for ``(hobby, description)`` pairs into ``N x MAX_TERMS`` arrays."""
+    rows = [hash_features(hobby, description) for hobby, description in profiles]
+    if not rows:
+        return np.zeros((0, MAX_TERMS), dtype=np.int32), np.zeros((0, MAX_TERMS), dtype=np.float32)
+    cols, vals = zip(*rows)
+    return np.stack(cols), np.stack(vals)
+
+def document_frequencies(cols: np.ndarray, vals: np.ndarray) -> np.ndarray:
+    """Number of rows containing each hashed term."""
+    present = vals > 0
+    return np.bincount(cols[present], minlength=HASH_DIM).astype(np.float32)
+
+def inverse_document_frequencies(df: np.ndarray, n_docs: int) -> np.ndarray:
+    """Smoothed IDF, as in scikit-learn's ``smooth_idf=True``."""
+    return (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+
+def weight_rows(cols: np.ndarray, vals: np.ndarray, idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """IDF-weighted term values and their L2 norms for each row."""
+    weighted = vals * idf[cols]
+    norms = np.sqrt(np.einsum("ij,ij->i", weighted, weighted))
+    return weighted, norms
+
+def query_vector(query_cols: np.ndarray, query_vals: np.ndarray, idf: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Dense IDF-weighted query vector over the hashed vocabulary and its norm."""
+    query = np.zeros(HASH_DIM, dtype=np.float32)
+    np.add.at(query, query_cols, query_vals * idf[query_cols])
+    return query, float(np.linalg.norm(query))
+
+def text_similarity(
+    query: np.ndarray,
+    query_norm: float,
+    cols: np.ndarray,
+    weighted: np.ndarray,
+    norms: np.ndarray,
+) -> np.ndarray:
+    """Cosine similarity between one query vector and every candidate row."""
+    if query_norm == 0 or len(cols) == 0:
+        return np.zeros(len(cols), dtype=np.float32)
+
+    dots = np.einsum("ij,ij->i", weighted, query[cols])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = dots / (norms * query_norm)
+    return np.nan_to_num(similarity, copy=False)
+
+def score_candidates(
+    query: np.ndarray,
+    query_norm: float,
+    query_age: int,
+    cols: np.ndarray,
+    weighted: np.ndarray,
+    norms: np.ndarray,
+    ages: np.ndarray,
+    genders: np.ndarray,
+    preferred_gender: int = 0,
+    eligible: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Blend text similarity and age proximity; ineligible rows score ``-inf``.
+
+    ``preferred_gender`` of 0 accepts every gender.
+    """
+    text = text_similarity(query, query_norm, cols, weighted, norms)
+    age = np.exp(-np.abs(ages.astype(np.float32) - query_age) / AGE_SCALE)
+    scores = TEXT_WEIGHT * text + AGE_WEIGHT * age
+
+    mask = np.ones(len(scores), dtype=bool) if eligible is None else eligible.copy()
+    if preferred_gender:
+        mask &= genders == preferred_gender
+    scores[~mask] = -np.inf
+    return scores
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` best finite scores, best first."""
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def default_preference(gender: Optional[str]) -> int:
+    """Opposite of the requester's gender when it is Male/Female, otherwise any."""
+    code = gender_code(gender)
+    if code == GENDER_CODES["male"]:
+        return GENDER_CODES["female"]
+    if code == GENDER_CODES["female"]:
+        return GENDER_CODES["male"]
+    return 0
+
+def parse_preference(preferred: Optional[str], requester_gender: Optional[str]) -> int:
+    """Resolve the ``gender`` query parameter ("any", a gender, or unset)."""
+    if preferred is None:
+        return default_preference(requester_gender)
+    if preferred.strip().lower() == "any":
+        return 0
+    return gender_code(preferred)
+
+def rank(usernames: Sequence[str], scores: np.ndarray, order: np.ndarray) -> list:
+    return [(usernames[i], float(scores[i])) for i in order]
@@ -0,0 +1,228 @@
+"""Request and database instrumentation, exposed in Prometheus text format.
+
+``MetricsMiddleware`` opens a per-request ``RequestStats`` in a context
+variable. SQLAlchemy cursor events and the pool checkout timing in
+``database.Database`` add to it from whichever thread or greenlet runs the
+query (both copy the request's context), and the middleware folds the
+totals into per-route histograms once the response has been sent. Global
+histograms are only touched on the event loop, so no locks are needed.
+
+SQL statements are logged only when slower than ``DB_SLOW_QUERY_MS`` or for
+a ``DB_LOG_SAMPLE_RATE`` fraction of queries, instead of echoing them all.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger("ntumatch.sql")
+
+# Log queries slower than this many milliseconds (0 disables)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# Fraction of all queries to log regardless of duration
+DB_LOG_SAMPLE_RATE = float(os.getenv("DB_LOG_SAMPLE_RATE", "0"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            # Per-bucket counts, then +Inf count and sum
+            series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative:g}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {cumulative:g}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:g}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative:g}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}{{{labels}}} {value:g}" if labels else f"{self.name} {value:g}")
+        return lines
+
+class Gauge:
+    """Gauge whose values are read from a callback at scrape time.
+
+    With ``labels`` the callback returns a mapping of label tuples to values.
+    """
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Any], labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labels = tuple(labels)
+
+    def render(self) -> List[str]:
+        value = self.read()
+        if value is None:
+            return []
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        if not self.labels:
+            return lines + [f"{self.name} {value:g}"]
+        for label_values, series_value in sorted(value.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {series_value:g}")
+        return lines
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        # Re-registering a name (a rebuilt engine or middleware stack) replaces the old metric
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+ROUTE_LABELS = ("method", "route")
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ROUTE_LABELS + ("status",)))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "End-to-end request latency.", ROUTE_LABELS))
+request_queries = registry.register(Histogram(
+    "http_request_db_queries", "Database statements executed per request.", ROUTE_LABELS, COUNT_BUCKETS))
+request_db_time = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent executing database statements per request.", ROUTE_LABELS))
+request_pool_wait = registry.register(Histogram(
+    "http_request_db_pool_wait_seconds", "Time waiting to check a connection out of the pool.", ROUTE_LABELS))
+queries_outside_requests = registry.register(Counter(
+    "db_queries_outside_requests_total", "Database statements executed outside any request (startup, jobs).", ()))
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "pool_wait_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+def observe_pool_wait(seconds: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+# SQLAlchemy instrumentation
+
+def instrument_engine(engine) -> None:
+    """Attach query counting, timing and slow/sampled logging to a (sync) engine."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+        else:
+            queries_outside_requests.inc()
+
+        if DB_SLOW_QUERY_MS and elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+        elif DB_LOG_SAMPLE_RATE and random.random() < DB_LOG_SAMPLE_RATE:
+            logger.info("Sampled query (%.1f ms): %s", elapsed * 1000, statement)
+
+def instrument_pool(engine) -> None:
+    """Expose pool occupancy gauges for a (sync) engine's QueuePool."""
+    pool = engine.pool
+    for name, help_text, attribute in (
+        ("db_pool_size", "Configured pool size.", "size"),
+        ("db_pool_checked_out", "Connections currently checked out.", "checkedout"),
+        ("db_pool_checked_in", "Idle connections held by the pool.", "checkedin"),
+    ):
+        read = getattr(pool, attribute, None)
+        if read is not None:
+            registry.register(Gauge(name, help_text, read))
+
+# ASGI middleware
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = "500"
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"))
+            requests_total.inc(*labels, status)
+            request_duration.observe(elapsed, *labels)
+            request_queries.observe(stats.queries, *labels)
+            request_db_time.observe(stats.db_seconds, *labels)
+            request_pool_wait.observe(stats.pool_wait_seconds, *labels)
@@ -0,0 +1,55 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from models import Base
+
+config = context.config
+
+# Only configure logging when run from the alembic CLI, not from the app lifespan
+if config.config_file_name is not None and config.get_main_option("sqlalchemy.url") is None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+if config.get_main_option("sqlalchemy.url") is None:
+    from database import DATABASE_URL
+    config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
+target_metadata = Base.metadata
+
+# Database-side objects that are deliberately not mapped in models.py
+UNMAPPED = {("column", "search_vector"), ("index", "ix_users_search_vector")}
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Keep autogenerate from dropping the PostgreSQL search vector (migration 0004)."""
+    return not (reflected and (type_, name) in UNMAPPED)
+
+def run_migrations_offline() -> None:
+    """Emit SQL to stdout instead of running it (``alembic upgrade head --sql``)."""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        # Batch mode lets ALTERs work on SQLite, which is used for local databases
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,43 @@
+"""Initial users table, as previously created by Base.metadata.create_all
+
+Databases created before migrations existed already have this table; the
+upgrade is a no-op for them and they are simply stamped at this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Single-column indexes the original model declared (index=True on every column)
+LEGACY_INDEXES = ["telegram_username", "email", "name", "age", "gender", "hobby", "description", "picture_id"]
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("users"):
+        return
+
+    op.create_table(
+        "users",
+        sa.Column("telegram_username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("age", sa.Integer(), nullable=False),
+        sa.Column("gender", sa.String(), nullable=False),
+        sa.Column("hobby", sa.String(), nullable=True),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("picture_id", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("telegram_username"),
+    )
+    for column in LEGACY_INDEXES:
+        op.create_index(f"ix_users_{column}", "users", [column], unique=column in ("telegram_username", "email"))
+
+def downgrade() -> None:
+    op.drop_table("users")
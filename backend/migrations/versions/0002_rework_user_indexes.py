@@ -0,0 +1,31 @@
+"""Drop write-amplifying single-column indexes, add access-path indexes
+
+The primary key already indexes telegram_username, and nothing filters on
+name, hobby, description or picture_id (long free text also bloats B-trees).
+Lookups by email (uniqueness), filtered keyset listing and age ranges get
+dedicated indexes instead.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+DROPPED = ["telegram_username", "name", "age", "gender", "hobby", "description", "picture_id"]
+
+def upgrade() -> None:
+    for column in DROPPED:
+        op.drop_index(f"ix_users_{column}", table_name="users", if_exists=True)
+    op.create_index("ix_users_active_gender_username", "users", ["is_active", "gender", "telegram_username"], if_not_exists=True)
+    op.create_index("ix_users_gender_age", "users", ["gender", "age"], if_not_exists=True)
+
+def downgrade() -> None:
+    op.drop_index("ix_users_gender_age", table_name="users")
+    op.drop_index("ix_users_active_gender_username", table_name="users")
+    for column in DROPPED:
+        op.create_index(f"ix_users_{column}", "users", [column], unique=column == "telegram_username")
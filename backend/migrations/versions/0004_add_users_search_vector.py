@@ -0,0 +1,33 @@
+"""Add a full-text search vector over hobby and description (PostgreSQL only)
+
+A generated tsvector column weights hobby (A) above description (B) and is
+indexed with GIN for /users/search. Other databases have no tsvector; the
+backend searches an in-process inverted index there instead.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        "ALTER TABLE users ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(hobby, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        ") STORED"
+    )
+    op.create_index("ix_users_search_vector", "users", ["search_vector"], postgresql_using="gin")
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_users_search_vector", table_name="users")
+    op.drop_column("users", "search_vector")
@@ -0,0 +1,29 @@
+"""Add users.latitude, users.longitude and users.location_name
+
+Nullable: existing users and users who skip the question have no location.
+Nearby lookups use the in-process grid index (geo_index.py), so no
+database index is added.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("latitude", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("longitude", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("location_name", sa.String(), nullable=True))
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("location_name")
+        batch_op.drop_column("longitude")
+        batch_op.drop_column("latitude")
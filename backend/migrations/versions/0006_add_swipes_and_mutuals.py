@@ -0,0 +1,45 @@
+"""Add the append-only swipes log and the mutuals table
+
+swipes only carries the (swiper, swipee, id) index needed for the
+reverse-edge lookup, so batch inserts stay cheap; mutuals is written once
+per match and read per user, newest first.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+BigId = sa.BigInteger().with_variant(sa.Integer(), "sqlite")
+
+def upgrade() -> None:
+    op.create_table(
+        "swipes",
+        sa.Column("id", BigId, primary_key=True, autoincrement=True),
+        sa.Column("swiper", sa.String(), nullable=False),
+        sa.Column("swipee", sa.String(), nullable=False),
+        sa.Column("liked", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_swipes_pair", "swipes", ["swiper", "swipee", "id"])
+    op.create_table(
+        "mutuals",
+        sa.Column("id", BigId, primary_key=True, autoincrement=True),
+        sa.Column("telegram_username", sa.String(), nullable=False),
+        sa.Column("other_username", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("telegram_username", "other_username", name="uq_mutuals_pair"),
+    )
+    op.create_index("ix_mutuals_user_id", "mutuals", ["telegram_username", "id"])
+
+def downgrade() -> None:
+    op.drop_index("ix_mutuals_user_id", table_name="mutuals")
+    op.drop_table("mutuals")
+    op.drop_index("ix_swipes_pair", table_name="swipes")
+    op.drop_table("swipes")
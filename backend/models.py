@@ -0,0 +1,77 @@
+from sqlalchemy import BigInteger, Column, Index, Integer, String, Boolean, DateTime, Float, UniqueConstraint
+from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime, timezone
+
+# Base class for models
+Base = declarative_base()
+
+# Database Model
+# Schema changes go through a migration in migrations/versions (see README)
+class User(Base):
+    __tablename__ = "users"
+
+    telegram_username = Column(String, primary_key=True)
+    email = Column(String, unique=True, index=True, nullable=False)
+    name = Column(String, nullable=False)
+    age = Column(Integer, nullable=False)
+    gender = Column(String, nullable=False)
+    hobby = Column(String, nullable=True)
+    description = Column(String, nullable=True)
+    picture_id = Column(String, nullable=True)
+    # Where the user is based: a shared Telegram location or a campus hall's coordinates
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    location_name = Column(String, nullable=True)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Row version for ETags: set on insert and bumped by every ORM or Core UPDATE
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    # PostgreSQL also has a generated search_vector tsvector column (migration 0004).
+    # It is not mapped: other databases lack it, and only /users/search reads it.
+
+    __table_args__ = (
+        # Filtered keyset listing: WHERE is_active AND gender ORDER BY telegram_username
+        Index("ix_users_active_gender_username", "is_active", "gender", "telegram_username"),
+        # Age-range filters within a gender
+        Index("ix_users_gender_age", "gender", "age"),
+    )
+
+# Auto-incrementing 64-bit key (SQLite only auto-increments INTEGER PRIMARY KEY)
+BigId = BigInteger().with_variant(Integer(), "sqlite")
+
+# Append-only like/pass log: every swipe is a new row and the newest one per pair wins.
+# No foreign keys and a single secondary index keep inserts cheap.
+class Swipe(Base):
+    __tablename__ = "swipes"
+
+    id = Column(BigId, primary_key=True, autoincrement=True)
+    swiper = Column(String, nullable=False)
+    swipee = Column(String, nullable=False)
+    liked = Column(Boolean, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Newest decision for a (swiper, swipee) pair, used for the reverse-edge lookup
+        Index("ix_swipes_pair", "swiper", "swipee", "id"),
+    )
+
+# Mutual likes, one row per direction so each user's list is a single index range
+class Mutual(Base):
+    __tablename__ = "mutuals"
+
+    id = Column(BigId, primary_key=True, autoincrement=True)
+    telegram_username = Column(String, nullable=False)
+    other_username = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        UniqueConstraint("telegram_username", "other_username", name="uq_mutuals_pair"),
+        # Newest-first keyset pagination per user
+        Index("ix_mutuals_user_id", "telegram_username", "id"),
+    )
@@ -0,0 +1,121 @@
+"""In-process inverted index over ``hobby`` and ``description`` for /users/search.
+
+Used when the database has no full-text search of its own (SQLite in local
+development); on PostgreSQL the endpoint queries the ``search_vector``
+tsvector column and its GIN index instead. Like ``match_index.MatchIndex``,
+each worker builds it at startup and keeps it in sync on every write path.
+
+Postings map each token to ``{telegram_username: weighted term frequency}``,
+with hobby terms counting ``matching.HOBBY_WEIGHT`` times as much as
+description terms. A query matches profiles containing every query token
+and ranks them by BM25. Tokens are lowercased alphanumeric runs with no
+stemming, so "climb" does not match "climbing" (PostgreSQL's ``english``
+configuration does stem).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import heapq
+import math
+import threading
+
+import matching
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Scores are rounded so keyset cursors compare equal across requests
+SCORE_DIGITS = 6
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.enabled = False
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.lengths: Dict[str, float] = {}
+        self.terms: Dict[str, Tuple[str, ...]] = {}
+        self.total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    # Writes
+
+    def build(self, rows: Iterable[Tuple[str, Optional[str], Optional[str], bool]]) -> None:
+        """Replace the contents with ``(username, hobby, description, is_active)`` rows and enable the index."""
+        with self._lock:
+            self.postings = {}
+            self.lengths = {}
+            self.terms = {}
+            self.total_length = 0.0
+            for telegram_username, hobby, description, is_active in rows:
+                if is_active:
+                    self._add(telegram_username, hobby, description)
+            self.enabled = True
+
+    def upsert(self, telegram_username: str, hobby: Optional[str], description: Optional[str], is_active: bool = True) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._discard(telegram_username)
+            if is_active:
+                self._add(telegram_username, hobby, description)
+
+    def remove(self, telegram_username: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._discard(telegram_username)
+
+    # Queries
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, str]] = None) -> List[Tuple[str, float]]:
+        """Up to ``limit`` ``(username, score)`` pairs, best first, ranked after the ``(score, username)`` cursor."""
+        tokens = list(dict.fromkeys(matching.tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            lists = [self.postings.get(token) for token in tokens]
+            if not all(lists):
+                return []
+            # Intersect starting from the rarest token
+            lists.sort(key=len)
+            candidates = [username for username in lists[0] if all(username in postings for postings in lists[1:])]
+
+            n = len(self.lengths)
+            average_length = self.total_length / n
+            idfs = [math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5)) for postings in lists]
+            scored = []
+            for username in candidates:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[username] / average_length)
+                score = 0.0
+                for idf, postings in zip(idfs, lists):
+                    tf = postings[username]
+                    score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                score = round(score, SCORE_DIGITS)
+                if after is None or score < after[0] or (score == after[0] and username > after[1]):
+                    scored.append((-score, username))
+        return [(username, -negative) for negative, username in heapq.nsmallest(limit, scored)]
+
+    # Internals
+
+    def _add(self, telegram_username: str, hobby: Optional[str], description: Optional[str]) -> None:
+        counts: Dict[str, float] = {}
+        for text, weight in ((hobby, matching.HOBBY_WEIGHT), (description, matching.DESCRIPTION_WEIGHT)):
+            for token in matching.tokenize(text):
+                counts[token] = counts.get(token, 0.0) + weight
+        for token, count in counts.items():
+            self.postings.setdefault(token, {})[telegram_username] = count
+        length = sum(counts.values())
+        self.lengths[telegram_username] = length
+        self.terms[telegram_username] = tuple(counts)
+        self.total_length += length
+
+    def _discard(self, telegram_username: str) -> None:
+        length = self.lengths.pop(telegram_username, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for token in self.terms.pop(telegram_username):
+            postings = self.postings[token]
+            del postings[telegram_username]
+            if not postings:
+                del self.postings[token]
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+# The backend modules import each other as top-level modules (``import main``)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# A throwaway SQLite database, migrated at start-up
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.sqlite3"))
+os.environ.setdefault("DB_AUTO_MIGRATE", "true")
+os.environ.setdefault("DB_ECHO", "false")
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app on the test database, once start-up has finished."""
+    import main
+
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 30
+        while client.get("/users").status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        yield client
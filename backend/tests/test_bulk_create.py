@@ -0,0 +1,29 @@
+import pytest
+
+HERE = {"latitude": 1.3483, "longitude": 103.6831}
+
+
+def profile(i: int) -> dict:
+    return {
+        "telegram_username": f"bulk_user_{i}", "email": f"bulk_user_{i}@e.ntu.edu.sg", "name": f"Bulk {i}",
+        "age": 20, "gender": "Male", "hobby": "origami", "description": "folding paper", "picture_id": "photo", **HERE,
+    }
+
+
+@pytest.fixture(scope="module")
+def created(client):
+    response = client.post("/users/bulk", json=[profile(0), profile(1), profile(0)])
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_duplicates_are_row_errors(created):
+    assert created["created"] == 2
+    assert [(error["index"], error["telegram_username"]) for error in created["errors"]] == [(2, "bulk_user_0")]
+
+
+def test_created_rows_are_indexed(client, created):
+    found = [user["telegram_username"] for user in client.get("/users/search", params={"q": "origami"}).json()["items"]]
+    assert sorted(found) == ["bulk_user_0", "bulk_user_1"]
+    page = client.get("/users/nearby", params={**HERE, "radius_m": 100}).json()
+    assert {"bulk_user_0", "bulk_user_1"} <= {user["telegram_username"] for user in page["items"]}
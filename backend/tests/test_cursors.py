@@ -0,0 +1,66 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.fixture(scope="module")
+def client(client):
+    for i in range(3):
+        client.post("/users/", json={
+            "telegram_username": f"cursor_user_{i}", "email": f"cursor_user_{i}@e.ntu.edu.sg", "name": f"User {i}",
+            "age": 20, "gender": "Male", "hobby": "chess", "description": "hello", "picture_id": "photo",
+        })
+    return client
+
+
+MALFORMED = ["!!!", "", "YWJ", "YWJ=", "YWJj\n", "Y=Jj", "_w==", "é"]
+
+
+def test_encode_decode_round_trip():
+    assert main.decode_cursor(main.encode_cursor("cursor_user_1")) == "cursor_user_1"
+    assert main.decode_rank_cursor(main.encode_rank_cursor(0.5, "cursor_user_1")) == (0.5, "cursor_user_1")
+
+
+@pytest.mark.parametrize("cursor", MALFORMED)
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(HTTPException) as error:
+        main.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("payload", ["cursor_user_1", "5", "[1.0]", '["x", "cursor_user_1"]', '[1.0, 2]', '[true, "a"]', '[NaN, "a"]', '[1.0, ""]'])
+def test_decode_rank_cursor_rejects_wrong_shape(payload):
+    with pytest.raises(HTTPException) as error:
+        main.decode_rank_cursor(main.encode_cursor(payload))
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("match_id", ["cursor_user_1", " 5", "+5", "05", "-1", "٥"])
+def test_mutuals_cursor_rejects_non_ids(client, match_id):
+    response = client.get("/users/telegram/cursor_user_0/mutuals", params={"cursor": main.encode_cursor(match_id)})
+    assert response.status_code == 400
+
+
+def test_list_users_pages_with_cursor(client):
+    first = client.get("/users", params={"limit": 1}).json()
+    second = client.get("/users", params={"limit": 1, "cursor": first["next_cursor"]}).json()
+    assert second["items"][0]["telegram_username"] > first["items"][0]["telegram_username"]
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/users", {}),
+    ("/users/search", {"q": "chess"}),
+    ("/users/nearby", {"latitude": 1.35, "longitude": 103.68}),
+    ("/users/telegram/cursor_user_0/mutuals", {}),
+])
+@pytest.mark.parametrize("cursor", MALFORMED)
+def test_malformed_cursor_is_400(client, path, params, cursor):
+    response = client.get(path, params={**params, "cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_mutuals_cursor_accepts_ids(client):
+    response = client.get("/users/telegram/cursor_user_0/mutuals", params={"cursor": main.encode_cursor("12")})
+    assert response.status_code == 200
@@ -0,0 +1,49 @@
+import pytest
+
+PROFILE = {
+    "telegram_username": "patch_user", "email": "patch_user@e.ntu.edu.sg", "name": "Patch User",
+    "age": 22, "gender": "Male", "hobby": "chess", "description": "hi", "picture_id": "photo",
+}
+HERE = {"latitude": 1.3483, "longitude": 103.6831}
+
+
+@pytest.fixture(scope="module")
+def client(client):
+    client.post("/users/", json={**PROFILE, **HERE, "location_name": "Hall 2"})
+    return client
+
+
+def nearby(client):
+    page = client.get("/users/nearby", params={**HERE, "radius_m": 5000}).json()
+    return [user["telegram_username"] for user in page["items"]]
+
+
+@pytest.mark.parametrize("field", ["name", "email", "age", "gender", "hobby", "description", "picture_id"])
+def test_null_required_field_is_422(client, field):
+    response = client.patch("/users/telegram/patch_user", json={field: None})
+    assert response.status_code == 422
+    assert client.get("/users/telegram/patch_user").json()[field] == PROFILE[field]
+
+
+def test_patch_writes_only_given_fields(client):
+    response = client.patch("/users/telegram/patch_user", json={"hobby": "go"})
+    assert response.status_code == 200
+    assert response.json()["hobby"] == "go"
+    assert response.json()["name"] == PROFILE["name"]
+    assert response.json()["latitude"] is not None
+
+
+def test_patch_nulls_clear_location(client):
+    assert "patch_user" in nearby(client)
+    response = client.patch("/users/telegram/patch_user", json={"latitude": None, "longitude": None, "location_name": None})
+    assert response.status_code == 200
+    user = response.json()
+    assert (user["latitude"], user["longitude"], user["location_name"]) == (None, None, None)
+    assert "patch_user" not in nearby(client)
+
+
+def test_patch_coordinates_replace_hall(client):
+    response = client.patch("/users/telegram/patch_user", json=HERE)
+    assert response.status_code == 200
+    assert response.json()["location_name"] is None
+    assert "patch_user" in nearby(client)
@@ -0,0 +1,35 @@
+import pytest
+
+PROFILE = {
+    "telegram_username": "location_user", "email": "location_user@e.ntu.edu.sg", "name": "Location User",
+    "age": 21, "gender": "Female", "hobby": "running", "description": "hi", "picture_id": "photo",
+}
+HERE = {"latitude": 1.3483, "longitude": 103.6831}
+
+
+@pytest.fixture(scope="module")
+def client(client):
+    client.post("/users/", json={**PROFILE, **HERE})
+    return client
+
+
+def nearby(client):
+    page = client.get("/users/nearby", params={**HERE, "radius_m": 100}).json()
+    return [user["telegram_username"] for user in page["items"]]
+
+
+def test_put_without_location_keeps_it(client):
+    response = client.put("/users/telegram/location_user", json={**PROFILE, "hobby": "swimming"})
+    assert response.status_code == 200
+    assert response.json()["hobby"] == "swimming"
+    assert (response.json()["latitude"], response.json()["longitude"]) == (HERE["latitude"], HERE["longitude"])
+    assert "location_user" in nearby(client)
+
+
+def test_put_with_null_location_clears_it(client):
+    response = client.put("/users/telegram/location_user", json={**PROFILE, "latitude": None, "longitude": None})
+    assert response.status_code == 200
+    assert response.json()["latitude"] is None
+    assert "location_user" not in nearby(client)
+    client.put("/users/telegram/location_user", json={**PROFILE, **HERE})
+    assert "location_user" in nearby(client)
@@ -0,0 +1,131 @@
+"""Offline Telegram stand-ins for driving the bot in benchmarks.
+
+``StubRequest`` answers Bot API calls locally, so an ``Application`` built
+with it never touches the network, and ``UpdateFactory`` builds the
+``Update`` objects a real chat would produce.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.request import BaseRequest, RequestData
+
+BOT_ID = 1000000
+BOT_TOKEN = f"{BOT_ID}:stub-token"
+
+
+class StubRequest(BaseRequest):
+    """Bot API transport that fakes Telegram's replies.
+
+    Every call is counted per method, optionally delayed by ``latency``
+    seconds to mimic the round trip to Telegram, and answered with a minimal
+    valid result (the bot itself for ``getMe``, a message for ``send*``).
+    Outgoing message texts are kept in ``sent`` when ``record`` is set.
+
+    With ``flood_rate`` set, chat-bound calls beyond that many per second
+    (a token bucket holding one second's worth) are answered like Telegram's
+    flood control: HTTP 429 with ``retry_after`` seconds, counted in ``floods``.
+    """
+
+    def __init__(self, latency: float = 0.0, record: bool = False, flood_rate: Optional[float] = None, retry_after: int = 1):
+        self.latency = latency
+        self.record = record
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.sent: list = []
+        self.floods = 0
+        self._message_ids = itertools.count(1)
+        self._tokens = flood_rate or 0.0
+        self._refilled = time.monotonic()
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None, **kwargs: Any) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        self.calls[api_method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        parameters: Dict[str, Any] = request_data.parameters if request_data is not None else {}
+        if self.flood_rate and "chat_id" in parameters and not self._take():
+            self.floods += 1
+            body = {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self.retry_after}", "parameters": {"retry_after": self.retry_after}}
+            return 429, json.dumps(body).encode()
+        if self.record and "chat_id" in parameters:
+            self.sent.append((parameters["chat_id"], api_method, parameters.get("text") or parameters.get("caption")))
+        return 200, json.dumps({"ok": True, "result": self._result(api_method, parameters)}).encode()
+
+    def _take(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.flood_rate, self._tokens + (now - self._refilled) * self.flood_rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _result(self, api_method: str, parameters: Dict[str, Any]) -> Any:
+        if api_method == "getMe":
+            return {"id": BOT_ID, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+        if api_method.startswith("send") or api_method.startswith("edit"):
+            message = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(parameters.get("chat_id", 0)), "type": "private"},
+                "text": parameters.get("text", ""),
+            }
+            if api_method == "sendMediaGroup":
+                return [dict(message, message_id=next(self._message_ids)) for _ in parameters.get("media", [])]
+            return message
+        return True
+
+
+class UpdateFactory:
+    """Builds private-chat ``Update``s for a simulated user ``i``."""
+
+    def __init__(self, bot, prefix: str = "load_user"):
+        self.bot = bot
+        self.prefix = prefix
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def username(self, i: int) -> str:
+        return f"{self.prefix}_{i}"
+
+    def _update(self, i: int, **message: Any) -> Update:
+        user = {"id": 10_000_000 + i, "is_bot": False, "first_name": f"User {i}", "username": self.username(i)}
+        data = {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user["id"], "type": "private"},
+                "from": user,
+                **message,
+            },
+        }
+        return Update.de_json(data, self.bot)
+
+    def text(self, i: int, text: str) -> Update:
+        if text.startswith("/"):
+            command = text.split()[0]
+            return self._update(i, text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(command)}])
+        return self._update(i, text=text)
+
+    def photo(self, i: int, file_id: str = "stub-photo") -> Update:
+        return self._update(i, photo=[{"file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 640}])
+
+    def location(self, i: int, latitude: float, longitude: float) -> Update:
+        return self._update(i, location={"latitude": latitude, "longitude": longitude})
@@ -0,0 +1,134 @@
+"""Shared helpers for the benchmark scripts.
+
+The benchmarks import the bot and backend modules the same way the Docker
+images run them, with ``frontend/`` or ``backend/`` as the import root.
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_DIR = os.path.join(ROOT, "frontend")
+BACKEND_DIR = os.path.join(ROOT, "backend")
+
+
+def use_frontend() -> None:
+    """Make the bot modules importable (``api_client``, ``commands.*``)."""
+    if FRONTEND_DIR not in sys.path:
+        sys.path.insert(0, FRONTEND_DIR)
+
+
+def use_backend() -> None:
+    """Make the backend modules importable (``main``)."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean of latencies given in seconds, reported in milliseconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": (statistics.fmean(samples) * 1000) if samples else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """Run an ASGI app under uvicorn in a background thread."""
+
+    def __init__(self, app, port: int = 0):
+        import uvicorn
+
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+class BackendProcess:
+    """Run ``uvicorn main:app`` from ``backend/`` in a subprocess.
+
+    ``env`` is merged over the current environment, e.g. ``DATABASE_URL`` and
+    ``DB_ASYNC``. SQL echo is off unless overridden.
+    """
+
+    def __init__(self, env: Dict[str, str]):
+        self.port = free_port()
+        self.env = {**os.environ, "DB_ECHO": "false", **env}
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "BackendProcess":
+        import httpx
+
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR,
+            env=self.env,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(f"{self.url}/health/ready").raise_for_status()
+                return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        self.process.kill()
+        raise RuntimeError("backend did not start")
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+def profile(i: int, prefix: str = "bench_user") -> dict:
+    """A valid UserCreate body."""
+    return {
+        "telegram_username": f"{prefix}_{i}",
+        "email": f"{prefix}_{i}@e.ntu.edu.sg",
+        "name": f"User {i}",
+        "age": 18 + i % 12,
+        "gender": "Male" if i % 2 else "Female",
+        "hobby": "bouldering",
+        "description": "hello there",
+        "picture_id": "file-id",
+    }
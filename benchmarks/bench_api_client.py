@@ -0,0 +1,123 @@
+"""Per-call latency of NTUMatchAPI: one client per call vs. the shared pooled client.
+
+Starts a local stand-in backend that answers the user endpoints from memory,
+then issues the same sequence of GET/PUT calls three times:
+
+* ``per-call``: a fresh ``httpx.AsyncClient`` per request (the old behaviour)
+* ``pooled``:   the long-lived keep-alive client owned by ``NTUMatchAPI``, with
+  the profile cache and request coalescing off, so every call goes over HTTP
+* ``cached``:   ``NTUMatchAPI`` as the bot runs it; GETs are mostly served by
+  the profile cache, so this leg measures the cache, not the transport
+
+Usage::
+
+    python benchmarks/bench_api_client.py --calls 2000 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from _util import ServerThread, summarize, use_frontend
+
+use_frontend()
+from api_client import NTUMatchAPI  # noqa: E402
+from profile_cache import ProfileCache  # noqa: E402
+
+
+def standin_app() -> FastAPI:
+    app = FastAPI()
+    users = {}
+
+    @app.get("/users/telegram/{telegram_username}")
+    def get_user(telegram_username: str):
+        if telegram_username not in users:
+            raise HTTPException(status_code=404, detail="User not found")
+        return users[telegram_username]
+
+    @app.put("/users/telegram/{telegram_username}")
+    def put_user(telegram_username: str, user: dict):
+        users[telegram_username] = user
+        return user
+
+    return app
+
+
+def profile(i: int) -> dict:
+    return {
+        "telegram_username": f"user{i}",
+        "email": f"user{i}@e.ntu.edu.sg",
+        "name": f"User {i}",
+        "age": 20,
+        "gender": "Male",
+        "hobby": "bouldering",
+        "description": "hello",
+        "picture_id": "file-id",
+    }
+
+
+async def per_call(base_url: str, i: int) -> None:
+    # Mirrors the previous implementation: a new client (and TCP connection) per call
+    async with httpx.AsyncClient() as client:
+        if i % 2:
+            response = await client.get(f"{base_url}/users/telegram/user{i % 100}")
+        else:
+            response = await client.put(f"{base_url}/users/telegram/user{i % 100}", json=profile(i % 100))
+        response.raise_for_status()
+
+
+async def pooled(api: NTUMatchAPI, i: int) -> None:
+    if i % 2:
+        await api.get_user_by_telegram_username(f"user{i % 100}")
+    else:
+        await api.update_user_by_telegram_username(f"user{i % 100}", profile(i % 100))
+
+
+async def run(calls: int, concurrency: int, fn) -> list:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await fn(i)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return latencies
+
+
+async def main(args) -> None:
+    with ServerThread(standin_app()) as server:
+        # Transport only: no cache hits and no shared in-flight GETs
+        api = NTUMatchAPI(server.url, http2=args.http2, cache=ProfileCache(max_size=0), coalesce=False)
+        cached_api = NTUMatchAPI(server.url, http2=args.http2)
+        await api.start()
+        await cached_api.start()
+        # Seed so GETs hit
+        for i in range(100):
+            await api.update_user_by_telegram_username(f"user{i}", profile(i))
+
+        before = await run(args.calls, args.concurrency, lambda i: per_call(server.url, i))
+        after = await run(args.calls, args.concurrency, lambda i: pooled(api, i))
+        cached = await run(args.calls, args.concurrency, lambda i: pooled(cached_api, i))
+        report = {
+            "per-call": summarize(before),
+            "pooled": {**summarize(after), "client": api.stats()},
+            "cached": {**summarize(cached), "client": cached_api.stats()},
+        }
+        await api.close()
+        await cached_api.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--http2", action="store_true", help="negotiate HTTP/2 on the pooled client")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,128 @@
+"""Backend CRUD throughput over an in-process ASGI transport, sync vs. async mode.
+
+Calls ``backend/main.py``'s ``app`` directly through ``httpx.ASGITransport``
+(no sockets, no uvicorn) against a fresh local database and times each
+endpoint the bot uses, in order:
+
+    create   POST   /users/                          one per dataset row
+    get      GET    /users/telegram/{username}       --requests random rows
+    update   PUT    /users/telegram/{username}       --requests random rows
+    delete   DELETE /users/telegram/{username}       one per dataset row
+
+Each mode runs in its own subprocess because ``database.py`` reads
+``DB_ASYNC`` at import. Results are printed as JSON and, with
+``--output``, appended as one line per run (tagged with the git commit) so
+requests/sec and tail latency can be tracked across commits::
+
+    python benchmarks/bench_backend_crud.py --users 5000 --concurrency 32
+    python benchmarks/bench_backend_crud.py --output bench-results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from _util import ROOT, profile, summarize, use_backend
+
+OPERATIONS = ("create", "get", "update", "delete")
+
+
+async def timed(concurrency: int, calls) -> dict:
+    """Run ``calls`` (coroutine factories) with ``concurrency`` in flight."""
+    latencies = []
+    errors = 0
+    pending = iter(calls)
+
+    async def worker() -> None:
+        nonlocal errors
+        for call in pending:
+            start = time.perf_counter()
+            response = await call()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"rps": len(latencies) / elapsed, "errors": errors, **summarize(latencies)}
+
+
+async def run_worker(args) -> dict:
+    import httpx
+
+    use_backend()
+    from main import app
+
+    users = [profile(i) for i in range(args.users)]
+    sample = [random.randrange(args.users) for _ in range(args.requests)]
+    path = lambda i: f"/users/telegram/{users[i]['telegram_username']}"  # noqa: E731
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://backend") as client:
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.05)
+            results["create"] = await timed(args.concurrency, (lambda user=user: client.post("/users/", json=user) for user in users))
+            results["get"] = await timed(args.concurrency, (lambda i=i: client.get(path(i)) for i in sample))
+            results["update"] = await timed(args.concurrency, (
+                lambda i=i: client.put(path(i), json={**users[i], "description": f"updated {random.random()}"}) for i in sample
+            ))
+            results["delete"] = await timed(args.concurrency, (lambda i=i: client.delete(path(i)) for i in range(args.users)))
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(args) -> None:
+    report = {
+        "benchmark": "backend_crud",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "users": args.users,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "modes": {},
+    }
+    for mode in args.modes:
+        database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+        env = {**os.environ, "DATABASE_URL": database_url, "DB_ASYNC": "true" if mode == "async" else "false", "DB_ECHO": "false"}
+        command = [sys.executable, __file__, "--worker", "--users", str(args.users), "--requests", str(args.requests), "--concurrency", str(args.concurrency)]
+        output = subprocess.run(command, env=env, capture_output=True, text=True)
+        if output.returncode != 0:
+            raise RuntimeError(f"{mode} run failed:\n{output.stderr}")
+        report["modes"][mode] = json.loads(output.stdout.splitlines()[-1])
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000, help="dataset size (rows created and deleted)")
+    parser.add_argument("--requests", type=int, default=5000, help="get and update requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--database-url", default=None, help="must point at an empty database; defaults to a temporary SQLite file per mode")
+    parser.add_argument("--output", default=None, help="append the JSON result as one line to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.worker:
+        print(json.dumps(asyncio.run(run_worker(arguments))))
+    else:
+        main(arguments)
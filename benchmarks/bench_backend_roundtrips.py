@@ -0,0 +1,150 @@
+"""Database round trips per write operation, against a high-latency database stand-in.
+
+Runs ``backend/main.py``'s ``app`` in-process (sync mode, ``httpx.ASGITransport``)
+on SQLite, with every DBAPI connection wrapped so that each statement,
+``COMMIT`` and ``ROLLBACK`` sent while a transaction is open sleeps for
+``--latency-ms``, the way a network round trip to a remote PostgreSQL
+would. The wrapper sits below SQLAlchemy, so pool pre-ping statements are
+counted too.
+
+Each operation runs ``--operations`` times one after another; the report
+gives round trips per call and latency per call. A conflicting create and a
+missing update/delete are included to check they still answer 409/404::
+
+    python benchmarks/bench_backend_roundtrips.py --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from _util import profile, summarize, use_backend
+
+
+class Link:
+    """Round-trip counter and delay shared by all wrapped connections."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    def trip(self) -> None:
+        with self._lock:
+            self.round_trips += 1
+        time.sleep(self.latency)
+
+
+class SlowCursor:
+    def __init__(self, cursor, link: Link):
+        self._cursor = cursor
+        self._link = link
+
+    def execute(self, *args):
+        self._link.trip()
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        self._link.trip()
+        return self._cursor.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SlowConnection:
+    def __init__(self, connection: sqlite3.Connection, link: Link):
+        object.__setattr__(self, "_connection", connection)
+        object.__setattr__(self, "_link", link)
+
+    def cursor(self, *args):
+        return SlowCursor(self._connection.cursor(*args), self._link)
+
+    def commit(self):
+        if self._connection.in_transaction:
+            self._link.trip()
+        return self._connection.commit()
+
+    def rollback(self):
+        if self._connection.in_transaction:
+            self._link.trip()
+        return self._connection.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+async def measure(link: Link, calls, expected: int) -> dict:
+    latencies = []
+    unexpected = 0
+    before = link.round_trips
+    for call in calls:
+        start = time.perf_counter()
+        response = await call()
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != expected:
+            unexpected += 1
+    return {
+        "round_trips_per_call": (link.round_trips - before) / len(latencies),
+        "unexpected_status": unexpected,
+        **summarize(latencies),
+    }
+
+
+async def main(args) -> dict:
+    os.environ.update(DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/bench.db", DB_ASYNC="false", DB_ECHO="false")
+    use_backend()
+    import httpx
+    from sqlalchemy import event
+
+    import database
+    from main import app
+
+    link = Link(args.latency_ms / 1000)
+    engine = database.init_engine()
+
+    @event.listens_for(engine, "do_connect")
+    def connect(dialect, connection_record, cargs, cparams):
+        return SlowConnection(sqlite3.connect(*cargs, **cparams), link)
+
+    n = args.operations
+    users = [profile(i) for i in range(n)]
+    path = lambda i: f"/users/telegram/{users[i]['telegram_username']}"  # noqa: E731
+
+    results = {"latency_ms": args.latency_ms, "operations": n}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://backend") as client:
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.05)
+            results["create"] = await measure(link, (lambda i=i: client.post("/users/", json=users[i]) for i in range(n)), 200)
+            results["create_conflict"] = await measure(link, (lambda i=i: client.post("/users/", json=users[i]) for i in range(n)), 409)
+            results["get"] = await measure(link, (lambda i=i: client.get(path(i)) for i in range(n)), 200)
+            results["update"] = await measure(link, (
+                lambda i=i: client.put(path(i), json={**users[i], "description": f"updated {i}"}) for i in range(n)
+            ), 200)
+            results["update_missing"] = await measure(link, (
+                lambda i=i: client.put(f"/users/telegram/missing_{i}", json={**users[i], "telegram_username": f"missing_{i}"}) for i in range(n)
+            ), 404)
+            results["patch"] = await measure(link, (lambda i=i: client.patch(path(i), json={"hobby": "chess"}) for i in range(n)), 200)
+            results["delete"] = await measure(link, (lambda i=i: client.delete(path(i)) for i in range(n)), 200)
+            results["delete_missing"] = await measure(link, (lambda i=i: client.delete(path(i)) for i in range(n)), 404)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated round trip to the database")
+    parser.add_argument("--operations", type=int, default=50, help="calls per operation")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
+    sys.stdout.flush()
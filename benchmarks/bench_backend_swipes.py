@@ -0,0 +1,120 @@
+"""Swipe throughput: batched ``POST /likes`` and mutual-match detection.
+
+Calls ``backend/main.py``'s ``app`` in-process through ``httpx.ASGITransport``
+against a fresh local database seeded with ``--users`` profiles, then
+records ``--swipes`` swipes. Each directed pair is swiped at most once and
+liked with probability ``--like-rate``, so the expected mutual matches are
+known up front and checked against what the endpoint reported and what
+``/mutuals`` lists. Swipes go out in batches of ``--batch`` with
+``--concurrency`` requests in flight; a shorter run with one swipe per
+request is timed for comparison::
+
+    python benchmarks/bench_backend_swipes.py --swipes 200000 --batch 500
+    python benchmarks/bench_backend_swipes.py --async-mode
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from _util import profile, summarize, use_backend
+
+
+def swipe_log(users: int, count: int, like_rate: float, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    seen = set()
+    swipes = []
+    while len(swipes) < count:
+        swiper, swipee = rng.randrange(users), rng.randrange(users)
+        if swiper == swipee or (swiper, swipee) in seen:
+            continue
+        seen.add((swiper, swipee))
+        swipes.append({"swiper": f"swipe_{swiper}", "swipee": f"swipe_{swipee}", "liked": rng.random() < like_rate})
+    return swipes
+
+
+def expected_mutuals(swipes: list) -> set:
+    likes = {(swipe["swiper"], swipe["swipee"]) for swipe in swipes if swipe["liked"]}
+    return {tuple(sorted(edge)) for edge in likes if (edge[1], edge[0]) in likes}
+
+
+async def send(client, batches: list, concurrency: int) -> dict:
+    latencies, reported = [], set()
+    pending = iter(batches)
+
+    async def worker() -> None:
+        for batch in pending:
+            start = time.perf_counter()
+            response = await client.post("/likes", json={"swipes": batch})
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            reported.update(tuple(sorted((m["telegram_username"], m["other_username"]))) for m in response.json()["mutuals"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    swipes = sum(len(batch) for batch in batches)
+    return {"swipes": swipes, "swipes_per_sec": swipes / elapsed, "requests": len(batches), "reported": reported, **summarize(latencies)}
+
+
+async def main(args) -> dict:
+    os.environ.update(
+        DATABASE_URL=args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+        DB_ASYNC="true" if args.async_mode else "false",
+        DB_ECHO="false",
+        BATCH_MAX_ROWS=str(max(args.batch, 50000)),
+        # One simulated client sends everyone's swipes
+        ADMISSION_USER_RATE="0",
+        ADMISSION_MAX_POOL_WAIT_MS="0",
+    )
+    use_backend()
+    import httpx
+
+    from main import app
+
+    swipes = swipe_log(args.users, args.swipes + args.single_swipes, args.like_rate)
+    batched, singles = swipes[:args.swipes], swipes[args.swipes:]
+    report = {"users": args.users, "batch": args.batch, "concurrency": args.concurrency, "async": args.async_mode}
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://backend", timeout=120) as client:
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.05)
+            users = "".join(json.dumps(profile(i, "swipe")) + "\n" for i in range(args.users))
+            (await client.post("/users/bulk", content=users, headers={"Content-Type": "application/x-ndjson"})).raise_for_status()
+
+            result = await send(client, [batched[i:i + args.batch] for i in range(0, len(batched), args.batch)], args.concurrency)
+            expected = expected_mutuals(batched)
+            report["batched"] = {**{k: v for k, v in result.items() if k != "reported"}, "mutuals_expected": len(expected), "mutuals_reported": len(result["reported"]), "mutuals_missed": len(expected - result["reported"])}
+
+            result = await send(client, [[swipe] for swipe in singles], args.concurrency)
+            report["single"] = {k: v for k, v in result.items() if k != "reported"}
+
+            # Every mutual must be listed for both users
+            listed = 0
+            for username in {user for pair in expected for user in pair}:
+                cursor = None
+                while True:
+                    page = (await client.get(f"/users/telegram/{username}/mutuals", params={"limit": 500, **({"cursor": cursor} if cursor else {})})).json()
+                    listed += len(page["items"])
+                    cursor = page["next_cursor"]
+                    if cursor is None:
+                        break
+            report["batched"]["mutuals_listed_per_user"] = listed
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--swipes", type=int, default=100000, help="swipes sent in batches")
+    parser.add_argument("--single-swipes", type=int, default=2000, help="swipes sent one per request")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--like-rate", type=float, default=0.5)
+    parser.add_argument("--async-mode", action="store_true", help="run the backend with DB_ASYNC=true")
+    parser.add_argument("--database-url", default=None, help="must point at an empty database; defaults to a temporary SQLite file")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,47 @@
+"""Bot throughput as the concurrent update limit grows.
+
+Runs the ``bench_bot_load`` session mix once per ``--limits`` value, with
+the bot built on ``PerUserUpdateProcessor`` as ``BOT_CONCURRENT_UPDATES``
+would set it. Every Bot API call is delayed by ``--telegram-latency-ms``;
+that round trip is what serializes a sequential bot. Reports updates/sec
+and latency percentiles per limit, against one backend subprocess.
+
+Usage::
+
+    python benchmarks/bench_bot_concurrency.py --users 500 --limits 1 4 16 64 256
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+
+from _bot import StubRequest
+from _util import BackendProcess
+from bench_bot_load import api_client, build_application, run_sessions
+
+
+async def main(args) -> None:
+    env = {"DATABASE_URL": args.database_url, "DB_ASYNC": "true" if args.async_mode else "false"}
+    results = []
+    with BackendProcess(env) as backend:
+        api_client.base_url = backend.url
+        await api_client.start()
+        for limit in args.limits:
+            application = build_application(StubRequest(latency=args.telegram_latency_ms / 1000), limit)
+            result = await run_sessions(application, args.users, prefix=f"limit_{limit}")
+            results.append({"limit": limit, **result})
+        await api_client.close()
+    print(json.dumps({"users": args.users, "telegram_latency_ms": args.telegram_latency_ms, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500, help="simulated users, all active at once")
+    parser.add_argument("--limits", nargs="+", type=int, default=[1, 4, 16, 64, 256])
+    parser.add_argument("--telegram-latency-ms", type=float, default=30.0, help="simulated Bot API round trip")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--async-mode", action="store_true", help="run the backend with DB_ASYNC=true")
+    arguments = parser.parse_args()
+    if arguments.database_url is None:
+        arguments.database_url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    asyncio.run(main(arguments))
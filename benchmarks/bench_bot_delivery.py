@@ -0,0 +1,112 @@
+"""Outbound delivery throughput under Telegram's flood limits, on a stubbed Bot API.
+
+Sends ``--profiles`` profile photos (with captions) to each of ``--chats``
+chats at once, the fan-out a round of match notifications would cause, in
+three ways:
+
+    direct    one send_photo per profile, no rate limiter (the old /match loop)
+    limited   one send_photo per profile through delivery.FloodLimiter as the bot's rate_limiter
+    queued    delivery.DeliveryQueue: media groups of up to 10, paced by its own FloodLimiter
+              (how main.py sends /match; the bot itself has no rate_limiter)
+
+``_bot.StubRequest`` delays every call by ``--telegram-latency-ms`` and
+answers calls beyond ``--telegram-rate`` per second with a 429
+``RetryAfter``, as Telegram does. The report lists delivered profiles/sec,
+Bot API calls, flood errors, failed profiles and how long each chat waited
+for its last profile. No network access is needed::
+
+    python benchmarks/bench_bot_delivery.py --chats 60 --profiles 10
+    python benchmarks/bench_bot_delivery.py --global-rate 40   # limiter above Telegram's limit: RetryAfter is honoured
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from _bot import BOT_TOKEN, StubRequest
+from _util import summarize, use_frontend
+
+use_frontend()
+from telegram.error import TelegramError  # noqa: E402
+from telegram.ext import ExtBot  # noqa: E402
+
+from delivery import DeliveryQueue, FloodLimiter  # noqa: E402
+
+MODES = ("direct", "limited", "queued")
+
+
+def profiles(chat: int, count: int) -> list:
+    return [(f"photo-{chat}-{i}", f"👤 **User {i}**, {18 + i % 12}\n🎯 Hobbies: chess\n📝 About me: hello") for i in range(count)]
+
+
+async def run(mode: str, args) -> dict:
+    stub = StubRequest(latency=args.telegram_latency_ms / 1000, flood_rate=args.telegram_rate, retry_after=args.retry_after)
+    limiter = FloodLimiter(global_rate=args.global_rate) if mode != "direct" else None
+    bot = ExtBot(BOT_TOKEN, request=stub, get_updates_request=StubRequest(), rate_limiter=limiter if mode == "limited" else None)
+    queue = DeliveryQueue(workers=args.workers, limiter=limiter if mode == "queued" else None)
+    latencies, failed = [], 0
+
+    async def chat(chat_id: int) -> None:
+        nonlocal failed
+        photos = profiles(chat_id, args.profiles)
+        start = time.perf_counter()
+        if mode == "queued":
+            try:
+                await queue.send_photos(bot, chat_id, photos, parse_mode="Markdown")
+            except TelegramError:
+                failed += len(photos)
+        else:
+            for photo, caption in photos:
+                try:
+                    await bot.send_photo(chat_id, photo, caption=caption, parse_mode="Markdown")
+                except TelegramError:
+                    failed += 1
+        latencies.append(time.perf_counter() - start)
+
+    async with bot:
+        stub.calls.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(chat(chat_id) for chat_id in range(1, args.chats + 1)))
+        elapsed = time.perf_counter() - start
+        await queue.stop()
+
+    delivered = args.chats * args.profiles - failed
+    return {
+        "mode": mode,
+        "elapsed_seconds": elapsed,
+        "profiles_delivered": delivered,
+        "profiles_per_sec": delivered / elapsed,
+        "api_calls": sum(stub.calls.values()),
+        "api_calls_per_sec": sum(stub.calls.values()) / elapsed,
+        "flood_errors": stub.floods,
+        "failed_profiles": failed,
+        "chat_completion": summarize(latencies),
+        **({"limiter": limiter.stats()} if limiter is not None else {}),
+        **({"queue": queue.stats()} if mode == "queued" else {}),
+    }
+
+
+async def main(args) -> None:
+    results = [await run(mode, args) for mode in args.modes]
+    report = {
+        "chats": args.chats,
+        "profiles_per_chat": args.profiles,
+        "telegram_latency_ms": args.telegram_latency_ms,
+        "telegram_rate": args.telegram_rate,
+        "global_rate": args.global_rate,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=60)
+    parser.add_argument("--profiles", type=int, default=10, help="profile photos sent to each chat")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--telegram-latency-ms", type=float, default=50.0, help="simulated Bot API round trip")
+    parser.add_argument("--telegram-rate", type=float, default=30.0, help="calls/sec the stub accepts before answering 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after (seconds) in the stub's 429 answers")
+    parser.add_argument("--global-rate", type=float, default=30.0, help="FloodLimiter's global calls/sec")
+    parser.add_argument("--workers", type=int, default=16, help="DeliveryQueue senders")
+    asyncio.run(main(parser.parse_args()))
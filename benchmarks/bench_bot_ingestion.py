@@ -0,0 +1,199 @@
+"""Update delivery latency: polling (getUpdates) vs. webhook mode.
+
+Simulates Telegram's side of both delivery paths with a one-way network
+delay of ``--rtt-ms / 2``:
+
+* polling: the bot's ``Updater`` long-polls a stubbed ``getUpdates``, which
+  answers as soon as updates are waiting (or after the poll timeout);
+* webhook: each update is POSTed to ``webhook.create_app`` served by
+  uvicorn on the bot's event loop, with the secret token header set.
+
+Updates arrive at Telegram as a Poisson stream of ``--rate`` per second.
+Latency runs from arrival at Telegram until the bot's handler has run. By
+default the handler does nothing, so the numbers isolate ingestion;
+``--handler-ms`` gives it work. The bot is built as ``main.py`` builds it, on
+``PerUserUpdateProcessor`` with ``--concurrent-updates`` and its update queue.
+Reports p50/p95/p99 per mode, plus the webhook's 503 refusals. Offline; no
+bot token needed.
+
+Usage::
+
+    python benchmarks/bench_bot_ingestion.py --updates 2000 --rate 200 --rtt-ms 60
+    # More updates than the handlers keep up with: the webhook sheds load with 503s
+    python benchmarks/bench_bot_ingestion.py --rate 400 --handler-ms 100 --concurrent-updates 8 --max-pending 32 --queue-size 100
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+import httpx
+
+from _bot import BOT_TOKEN, StubRequest, UpdateFactory
+from _util import free_port, summarize, use_frontend
+
+use_frontend()
+import uvicorn  # noqa: E402
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder, TypeHandler  # noqa: E402
+
+import webhook  # noqa: E402
+from update_processor import PerUserUpdateProcessor  # noqa: E402
+
+SECRET = "bench-secret"
+
+
+class TelegramServer(StubRequest):
+    """Stub Bot API that also serves ``getUpdates`` from a pending-updates queue."""
+
+    def __init__(self, one_way: float):
+        super().__init__()
+        self.one_way = one_way
+        self.pending: "asyncio.Queue[dict]" = asyncio.Queue()
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if not url.endswith("/getUpdates"):
+            return await super().do_request(url, method, request_data, **kwargs)
+        parameters = request_data.parameters if request_data is not None else {}
+        await asyncio.sleep(self.one_way)
+        try:
+            batch = [await asyncio.wait_for(self.pending.get(), parameters.get("timeout") or 10)]
+        except asyncio.TimeoutError:
+            batch = []
+        while not self.pending.empty() and len(batch) < 100:
+            batch.append(self.pending.get_nowait())
+        await asyncio.sleep(self.one_way)
+        return 200, json.dumps({"ok": True, "result": batch}).encode()
+
+
+class Recorder:
+    def __init__(self, application, handler_seconds: float = 0.0):
+        self.arrived: Dict[int, float] = {}
+        self.latencies: List[float] = []
+        self.done = asyncio.Event()
+        self.expected = 0
+        self.handler_seconds = handler_seconds
+        application.add_handler(TypeHandler(Update, self._handle))
+
+    async def _handle(self, update: Update, context) -> None:
+        if self.handler_seconds:
+            await asyncio.sleep(self.handler_seconds)
+        self.latencies.append(time.perf_counter() - self.arrived.pop(update.update_id))
+        if len(self.latencies) == self.expected:
+            self.done.set()
+
+
+def update_payloads(count: int) -> List[dict]:
+    factory = UpdateFactory(None)
+    return [factory.text(i % 1000, f"message {i}").to_dict() for i in range(count)]
+
+
+async def arrivals(payloads: List[dict], rate: float, recorder: Recorder, deliver) -> None:
+    """Release updates at Telegram as a Poisson stream and hand each to ``deliver``."""
+    tasks = []
+    for payload in payloads:
+        await asyncio.sleep(random.expovariate(rate))
+        recorder.arrived[payload["update_id"]] = time.perf_counter()
+        tasks.append(asyncio.create_task(deliver(payload)))
+    await asyncio.gather(*tasks)
+
+
+async def run_polling(args, payloads: List[dict]) -> dict:
+    telegram = TelegramServer(args.rtt_ms / 2000)
+    processor = PerUserUpdateProcessor(args.concurrent_updates, args.max_pending)
+    application = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(StubRequest())
+        .get_updates_request(telegram)
+        .concurrent_updates(processor)
+        .update_queue(processor.update_queue())
+        .build()
+    )
+    recorder = Recorder(application, args.handler_ms / 1000)
+    recorder.expected = len(payloads)
+
+    async def deliver(payload: dict) -> None:
+        await telegram.pending.put(payload)
+
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+        await arrivals(payloads, args.rate, recorder, deliver)
+        await recorder.done.wait()
+        await application.updater.stop()
+        await application.stop()
+    return summarize(recorder.latencies)
+
+
+async def run_webhook(args, payloads: List[dict]) -> dict:
+    processor = PerUserUpdateProcessor(args.concurrent_updates, args.max_pending)
+    application = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(StubRequest())
+        .updater(None)
+        .concurrent_updates(processor)
+        .update_queue(webhook.bounded_update_queue(processor, args.queue_size))
+        .build()
+    )
+    recorder = Recorder(application, args.handler_ms / 1000)
+    recorder.expected = len(payloads)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(webhook.create_app(application, SECRET), port=port, log_level="warning", access_log=False))
+    limits = httpx.Limits(max_connections=args.max_connections)
+    refused = 0
+
+    async with application, httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+        await application.start()
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+
+        async def deliver(payload: dict) -> None:
+            # Telegram retries refused deliveries; count them and retry the same way
+            nonlocal refused
+            while True:
+                await asyncio.sleep(args.rtt_ms / 2000)
+                response = await client.post(webhook.WEBHOOK_PATH, json=payload, headers={webhook.SECRET_HEADER: SECRET})
+                if response.status_code == 200:
+                    return
+                refused += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+        await arrivals(payloads, args.rate, recorder, deliver)
+        await recorder.done.wait()
+        server.should_exit = True
+        await serving
+        await application.stop()
+    return {**summarize(recorder.latencies), "refused": refused}
+
+
+async def main(args) -> None:
+    payloads = update_payloads(args.updates)
+    results = {
+        "updates": args.updates,
+        "rate": args.rate,
+        "rtt_ms": args.rtt_ms,
+        "handler_ms": args.handler_ms,
+        "concurrent_updates": args.concurrent_updates,
+        "max_pending": args.max_pending,
+        "polling": await run_polling(args, payloads),
+        "webhook": await run_webhook(args, payloads),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0, help="updates/sec arriving at Telegram")
+    parser.add_argument("--rtt-ms", type=float, default=60.0, help="simulated round trip between the bot and Telegram")
+    parser.add_argument("--queue-size", type=int, default=1000, help="webhook update queue bound")
+    parser.add_argument("--max-connections", type=int, default=40, help="connections Telegram opens to the webhook")
+    parser.add_argument("--handler-ms", type=float, default=0.0, help="time each update spends in its handler")
+    parser.add_argument("--concurrent-updates", type=int, default=1, help="BOT_CONCURRENT_UPDATES")
+    parser.add_argument("--max-pending", type=int, default=None, help="updates handled or waiting for a slot (default 64 x concurrent updates)")
+    asyncio.run(main(parser.parse_args()))
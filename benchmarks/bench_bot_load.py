@@ -0,0 +1,199 @@
+"""End-to-end bot throughput with thousands of simulated Telegram users.
+
+Builds the bot's ``Application`` with the real handlers from ``frontend/``
+but a stubbed Bot API transport (``_bot.StubRequest``), and points the shared
+``api_client`` at a backend subprocess on a throwaway local database. Each
+simulated user walks through a full session, waiting for the bot to finish
+each step before sending the next, as a person would:
+
+    /start, email, photo, name, age, gender, hobby, location or hall, description   (register)
+    /show
+    /edit, "Edit Age", age, "Cancel"
+    /delete, "Yes, delete my account"
+
+Updates enter through ``Application.update_queue`` like polled updates do.
+Latency is measured from enqueueing an update until its handler returns.
+The report lists updates/sec, p50/p95/p99 latency, per-state handler
+timings from ``bot_metrics`` and Bot API calls made. No network access is
+needed.
+
+Usage::
+
+    python benchmarks/bench_bot_load.py --users 2000
+    python benchmarks/bench_bot_load.py --users 2000 --telegram-latency-ms 50 --concurrent-updates 256
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from _bot import BOT_TOKEN, StubRequest, UpdateFactory
+from _util import BackendProcess, summarize, use_frontend
+
+use_frontend()
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder, TypeHandler  # noqa: E402
+
+import bot_metrics  # noqa: E402
+from api_client import api_client  # noqa: E402
+from commands.deletecommand import delete_handler  # noqa: E402
+from commands.editcommand import edit_handler  # noqa: E402
+from commands.showcommand import show_handler  # noqa: E402
+from commands.startcommand import start_handler  # noqa: E402
+from conversation_state import CONTEXT_TYPES, ConversationSweeper  # noqa: E402
+from delivery import delivery  # noqa: E402
+from persistence import SQLitePersistence  # noqa: E402
+from update_processor import PerUserUpdateProcessor  # noqa: E402
+
+
+def session(updates: UpdateFactory, i: int) -> List[Update]:
+    """The updates one user sends, in order."""
+    text = lambda value: updates.text(i, value)  # noqa: E731
+    return [
+        text("/start"),
+        text(f"{updates.username(i)}@e.ntu.edu.sg"),
+        updates.photo(i, f"photo-{i}"),
+        text(f"User {i}"),
+        text(str(18 + i % 12)),
+        text("Male" if i % 2 else "Female"),
+        text("bouldering and board games"),
+        updates.location(i, 1.3483, 103.6831) if i % 2 else text("Hall 2"),
+        text("hello there, looking for study buddies"),
+        text("/show"),
+        text("/edit"),
+        text("Edit Age"),
+        text(str(18 + (i + 1) % 12)),
+        text("Cancel"),
+        text("/delete"),
+        text("Yes, delete my account"),
+    ]
+
+
+class Driver:
+    """Feeds updates into the Application and resolves a future when each is handled."""
+
+    def __init__(self, application):
+        self.application = application
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.latencies: List[float] = []
+        self.errors = 0
+        # Group 1 runs after the bot's own handler in group 0 has returned
+        application.add_handler(TypeHandler(Update, self._handled), group=1)
+        application.add_error_handler(self._error)
+
+    async def _handled(self, update: Update, context) -> None:
+        future = self.pending.pop(update.update_id, None)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+
+    async def _error(self, update, context) -> None:
+        self.errors += 1
+
+    async def send(self, update: Update) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update.update_id] = future
+        start = time.perf_counter()
+        await self.application.update_queue.put(update)
+        self.latencies.append(await future - start)
+
+    async def user(self, updates: List[Update]) -> None:
+        for update in updates:
+            await self.send(update)
+
+
+def build_application(stub: StubRequest, concurrent_updates: int):
+    """The bot's Application, as main.py builds it, on the stubbed Bot API.
+
+    Like main.py it has no ``rate_limiter`` (fan-out is paced by
+    ``delivery``), and its post_init/post_shutdown run the conversation
+    sweeper and drain the delivery queue.
+    """
+    processor = PerUserUpdateProcessor(concurrent_updates)
+    sweeper = ConversationSweeper([start_handler, edit_handler, delete_handler])
+
+    async def post_shutdown(application) -> None:
+        await sweeper.stop()
+        await delivery.stop()
+
+    application = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(stub)
+        .get_updates_request(StubRequest())
+        .updater(None)
+        .update_queue(processor.update_queue())
+        .concurrent_updates(processor)
+        .context_types(CONTEXT_TYPES)
+        .persistence(SQLitePersistence(os.path.join(tempfile.mkdtemp(), "bot_state.sqlite3")))
+        .post_init(sweeper.start)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    for handler in (start_handler, edit_handler, delete_handler, show_handler):
+        application.add_handler(bot_metrics.instrument(handler))
+    return application
+
+
+async def run_sessions(application, users: int, prefix: str = "load_user") -> dict:
+    """Run ``users`` simulated sessions at once; ``api_client`` must be started."""
+    driver = Driver(application)
+    updates = UpdateFactory(application.bot, prefix)
+    sessions = [session(updates, i) for i in range(users)]
+    # The hooks run_polling would call around the Application's lifetime
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        start = time.perf_counter()
+        # api_client prints every non-2xx answer (e.g. 404 for new users)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(driver.user(updates) for updates in sessions))
+        elapsed = time.perf_counter() - start
+        await application.stop()
+    await application.post_shutdown(application)
+
+    handled = len(driver.latencies)
+    return {
+        "updates": handled,
+        "seconds": elapsed,
+        "updates_per_sec": handled / elapsed,
+        "handler_errors": driver.errors,
+        "latency": summarize(driver.latencies),
+    }
+
+
+async def main(args) -> None:
+    stub = StubRequest(latency=args.telegram_latency_ms / 1000)
+    application = build_application(stub, args.concurrent_updates)
+
+    env = {"DATABASE_URL": args.database_url, "DB_ASYNC": "true" if args.async_mode else "false"}
+    with BackendProcess(env) as backend:
+        api_client.base_url = backend.url
+        await api_client.start()
+        result = await run_sessions(application, args.users)
+        await api_client.close()
+
+    print(json.dumps({
+        "users": args.users,
+        **result,
+        "handlers": bot_metrics.handler_timings.summary({}),
+        "backend_requests": bot_metrics.http_timings.summary({}),
+        "bot_api_calls": dict(stub.calls),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="simulated users, all active at once")
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0, help="simulated Bot API round trip")
+    parser.add_argument("--concurrent-updates", type=int, default=1, help="BOT_CONCURRENT_UPDATES (1 = sequential, the default in main.py)")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--async-mode", action="store_true", help="run the backend with DB_ASYNC=true")
+    arguments = parser.parse_args()
+    if arguments.database_url is None:
+        arguments.database_url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    asyncio.run(main(arguments))
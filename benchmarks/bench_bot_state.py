@@ -0,0 +1,161 @@
+"""Conversation state: memory per idle conversation, eviction and restart recovery.
+
+Puts ``--conversations`` users half-way through registration (answers up to
+gender given, waiting for hobbies) straight into the bot's registration
+handler and ``Application.user_data``. Driving that many real sessions
+through the handlers would take minutes and allocate the same objects.
+It then reports:
+
+    memory       tracemalloc bytes per idle conversation, with ``UserState``
+                 (conversation_state.py) and with the old dict ``user_data``
+    sweep        time for ConversationSweeper to end all of them once idle,
+                 and the memory left afterwards
+    persistence  time for one SQLitePersistence write pass covering every
+                 conversation (one transaction), next to single-row commits
+                 (what writing on every update costs), and the state file size
+    recovery     time for a restarted Application to load them all back
+                 (``Application.initialize``), with the count restored
+
+Usage::
+
+    python benchmarks/bench_bot_state.py --conversations 100000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from _bot import BOT_TOKEN, StubRequest
+from _util import use_frontend
+
+use_frontend()
+os.environ.setdefault("BOT_STATE_DB", "bench")
+from telegram.ext import ApplicationBuilder, ContextTypes  # noqa: E402
+
+from commands.startcommand import HOBBY, start_handler  # noqa: E402
+from conversation_state import CONTEXT_TYPES, ConversationSweeper, IdleConversationHandler, RegistrationState, UserState  # noqa: E402
+from persistence import SQLitePersistence  # noqa: E402
+
+USER_ID_BASE = 10_000_000
+
+
+def registration_handler(persistent: bool) -> IdleConversationHandler:
+    """A fresh copy of the bot's registration conversation (one per Application)."""
+    return IdleConversationHandler(
+        entry_points=start_handler.entry_points,
+        states=start_handler.states,
+        fallbacks=start_handler.fallbacks,
+        name="registration",
+        persistent=persistent,
+        on_timeout=UserState.end_registration,
+    )
+
+
+def build(context_types: ContextTypes, persistence=None):
+    builder = ApplicationBuilder().token(BOT_TOKEN).request(StubRequest()).get_updates_request(StubRequest()).updater(None).context_types(context_types)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    application = builder.build()
+    handler = registration_handler(persistence is not None)
+    application.add_handler(handler)
+    return application, handler
+
+
+def answers(i: int) -> dict:
+    return {"email": f"user_{i}@e.ntu.edu.sg", "photo_file_id": f"AgACAgUAAxkBAAIB{i:012d}", "name": f"User {i}", "age": 18 + i % 12, "gender": "Male" if i % 2 else "Female"}
+
+
+def populate(application, handler, count: int, typed: bool) -> None:
+    now = time.monotonic()
+    for i in range(count):
+        user_id = USER_ID_BASE + i
+        handler._conversations[(user_id, user_id)] = HOBBY
+        # As IdleConversationHandler.handle_update records it
+        handler.last_active[(user_id, user_id)] = now
+        if typed:
+            application.user_data[user_id].registration = RegistrationState(**answers(i))
+        else:
+            application.user_data[user_id].update(answers(i))
+
+
+def measure_memory(count: int, typed: bool) -> dict:
+    application, handler = build(CONTEXT_TYPES if typed else ContextTypes())
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    populate(application, handler, count, typed)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    report = {"bytes_total": used, "bytes_per_conversation": used / count}
+    if typed:
+        sweeper = ConversationSweeper([handler], timeout=60)
+        start = time.perf_counter()
+        evicted, dropped = sweeper.sweep(application, now=time.monotonic() + 120)
+        report["sweep"] = {"seconds": time.perf_counter() - start, "ended": evicted, "states_dropped": dropped}
+        gc.collect()
+        report["sweep"]["bytes_left"] = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return report
+
+
+async def measure_persistence(count: int, single_rows: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bot_state.sqlite3")
+    persistence = SQLitePersistence(path)
+    application, handler = build(CONTEXT_TYPES, persistence)
+    async with application:
+        populate(application, handler, count, typed=True)
+        # What one Application.update_persistence pass hands over after every user moved
+        start = time.perf_counter()
+        for user_id, state in application.user_data.items():
+            await persistence.update_user_data(user_id, state)
+        for key, state in handler._conversations.items():
+            await persistence.update_conversation("registration", key, state)
+        await persistence._writer
+        batched = time.perf_counter() - start
+        transactions = persistence.transactions
+
+        # Writing on every update: one commit per changed row
+        start = time.perf_counter()
+        for i in range(single_rows):
+            persistence._write({USER_ID_BASE + i: application.user_data[USER_ID_BASE + i]}, {})
+        single = time.perf_counter() - start
+    report = {
+        "write_pass_seconds": batched,
+        "write_pass_transactions": transactions,
+        "batched_rows_per_sec": 2 * count / batched,
+        "single_commit_rows_per_sec": single_rows / single,
+        "state_file_bytes": sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)),
+    }
+
+    # Restart: a new Application on the same file
+    application, handler = build(CONTEXT_TYPES, SQLitePersistence(path))
+    start = time.perf_counter()
+    await application.initialize()
+    report["recovery_seconds"] = time.perf_counter() - start
+    report["recovered_conversations"] = len(handler._conversations)
+    report["recovered_user_states"] = sum(1 for state in application.user_data.values() if state.registration is not None)
+    await application.shutdown()
+    return report
+
+
+def main(args) -> None:
+    report = {
+        "conversations": args.conversations,
+        "memory": {
+            "typed": measure_memory(args.conversations, typed=True),
+            "dict": measure_memory(args.conversations, typed=False),
+        },
+        "persistence": asyncio.run(measure_persistence(args.conversations, args.single_rows)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--single-rows", type=int, default=2000, help="rows committed one at a time for comparison")
+    main(parser.parse_args())
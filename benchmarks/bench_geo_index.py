@@ -0,0 +1,84 @@
+"""Nearby lookups: ``geo_index.GeoIndex`` grid vs. a linear scan, as the corpus grows.
+
+Places ``--sizes`` profiles in and around the NTU campus (a tenth of them on
+campus halls, the rest spread over Singapore) and times ``--queries`` radius
+queries from random campus points for each size, against the grid index
+and against a haversine scan over every profile (what a query without a
+spatial index has to do). In-process; no backend or database needed::
+
+    python benchmarks/bench_geo_index.py --sizes 10000 100000 1000000 --radius-m 500
+"""
+import argparse
+import heapq
+import json
+import random
+import time
+
+from _util import summarize, use_backend
+
+use_backend()
+from geo_index import CAMPUS_HALLS, GeoIndex, haversine_metres  # noqa: E402
+
+SINGAPORE = ((1.25, 1.45), (103.62, 104.0))
+CAMPUS = ((1.340, 1.358), (103.676, 103.692))
+
+
+def points(count: int, rng: random.Random) -> list:
+    halls = list(CAMPUS_HALLS.values())
+    rows = []
+    for i in range(count):
+        if i % 10 == 0:
+            latitude, longitude = rng.choice(halls)
+        else:
+            (low_lat, high_lat), (low_lon, high_lon) = SINGAPORE
+            latitude, longitude = rng.uniform(low_lat, high_lat), rng.uniform(low_lon, high_lon)
+        rows.append((f"user_{i}", latitude, longitude, 18 + i % 12, "Male" if i % 2 else "Female", True))
+    return rows
+
+
+def scan(rows: list, latitude: float, longitude: float, radius: float, limit: int) -> list:
+    found = []
+    for username, point_latitude, point_longitude, *_ in rows:
+        distance = haversine_metres(latitude, longitude, point_latitude, point_longitude)
+        if distance <= radius:
+            found.append((distance, username))
+    return heapq.nsmallest(limit, found)
+
+
+def main(args) -> None:
+    rng = random.Random(1)
+    report = {"radius_m": args.radius_m, "sizes": {}}
+    for size in args.sizes:
+        rows = points(size, rng)
+        index = GeoIndex()
+        start = time.perf_counter()
+        index.build(rows)
+        build_seconds = time.perf_counter() - start
+
+        origins = [(rng.uniform(*CAMPUS[0]), rng.uniform(*CAMPUS[1])) for _ in range(args.queries)]
+        grid, linear, hits = [], [], 0
+        for latitude, longitude in origins:
+            start = time.perf_counter()
+            hits += len(index.nearby(latitude, longitude, args.radius_m, args.limit))
+            grid.append(time.perf_counter() - start)
+        for latitude, longitude in origins[: args.scan_queries]:
+            start = time.perf_counter()
+            scan(rows, latitude, longitude, args.radius_m, args.limit)
+            linear.append(time.perf_counter() - start)
+        report["sizes"][size] = {
+            "build_seconds": build_seconds,
+            "mean_hits": hits / len(origins),
+            "grid": summarize(grid),
+            "scan": summarize(linear),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--radius-m", type=float, default=500.0)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500, help="grid queries per size")
+    parser.add_argument("--scan-queries", type=int, default=10, help="linear-scan queries per size (slow)")
+    main(parser.parse_args())
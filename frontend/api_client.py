@@ -1,57 +1,359 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import httpx
 import asyncio
+import json
 
 from dotenv import load_dotenv
 import os
 
+from profile_cache import ProfileCache, NOT_REGISTERED
+from bot_metrics import InstrumentedTransport, timed
+from resilience import Bulkhead, CircuitBreaker, SingleFlight, backoff_delay, retry_after
+
 # Load environment variables
 load_dotenv()
 
-# Get backend URL 
+# Get backend URL
 backend_url = os.getenv("BACKEND_URL")
 
+# Connection pool settings for the shared HTTP client
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "100"))
+BACKEND_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("BACKEND_MAX_KEEPALIVE_CONNECTIONS", "20"))
+BACKEND_KEEPALIVE_EXPIRY = float(os.getenv("BACKEND_KEEPALIVE_EXPIRY", "30"))
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "10"))
+BACKEND_HTTP2 = os.getenv("BACKEND_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Retries for idempotent calls (transport errors, 429/502/503/504), with full-jitter backoff
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "2"))
+BACKEND_RETRY_BACKOFF = float(os.getenv("BACKEND_RETRY_BACKOFF", "0.1"))
+BACKEND_RETRY_BACKOFF_MAX = float(os.getenv("BACKEND_RETRY_BACKOFF_MAX", "2"))
+
+# Circuit breaker: open after this many consecutive failures, probe again after the reset timeout
+BACKEND_BREAKER_THRESHOLD = int(os.getenv("BACKEND_BREAKER_THRESHOLD", "5"))
+BACKEND_BREAKER_RESET = float(os.getenv("BACKEND_BREAKER_RESET", "30"))
+
+# Requests allowed to wait for a connection slot, and for how long, before failing fast
+BACKEND_MAX_WAITING = int(os.getenv("BACKEND_MAX_WAITING", "200"))
+BACKEND_WAIT_TIMEOUT = float(os.getenv("BACKEND_WAIT_TIMEOUT", "2"))
+
+# Responses worth retrying; the backend sheds load with 429/503 and Retry-After
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+# Profile cache settings
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+PROFILE_CACHE_NEGATIVE_TTL = float(os.getenv("PROFILE_CACHE_NEGATIVE_TTL", "10"))
+
 class NTUMatchAPI:
-    def __init__(self, base_url: str = f"{backend_url}"):
+    def __init__(
+        self,
+        base_url: str = f"{backend_url}",
+        *,
+        max_connections: int = BACKEND_MAX_CONNECTIONS,
+        max_keepalive_connections: int = BACKEND_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = BACKEND_KEEPALIVE_EXPIRY,
+        timeout: float = BACKEND_TIMEOUT,
+        http2: bool = BACKEND_HTTP2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[ProfileCache] = None,
+        coalesce: bool = True,
+        retries: int = BACKEND_RETRIES,
+        retry_backoff: float = BACKEND_RETRY_BACKOFF,
+        retry_backoff_max: float = BACKEND_RETRY_BACKOFF_MAX,
+        breaker: Optional[CircuitBreaker] = None,
+        max_waiting: int = BACKEND_MAX_WAITING,
+        wait_timeout: float = BACKEND_WAIT_TIMEOUT,
+    ):
         self.base_url = base_url
-    
-    async def create_user(self, user_data: Dict[str, Any]) -> Optional[dict]:
-        # Create a new user via API
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(f"{self.base_url}/users/", json=user_data)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                print(f"Error creating user: {e}")
-                return None
-
-    async def get_user_by_telegram_username(self, telegram_username: str) -> Optional[dict]:
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(f"{self.base_url}/users/telegram/{telegram_username}")
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                print(f"Error fetching user by Telegram username: {e}")
-                return None
-    
-    async def update_user_by_telegram_username (self, telegram_username: str, user_data: Dict[str, Any]) -> Optional[dict]:
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.put(f"{self.base_url}/users/telegram/{telegram_username}", json=user_data)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                print(f"Error updating user by Telegram username: {e}")
-                return None
-
-    async def delete_user_by_telegram_username(self, telegram_username: str) -> Optional[dict]:
-        async with httpx.AsyncClient() as client:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout)
+        self.http2 = http2
+        self.transport = transport
+        self.cache = cache if cache is not None else ProfileCache(
+            max_size=PROFILE_CACHE_SIZE,
+            ttl=PROFILE_CACHE_TTL,
+            negative_ttl=PROFILE_CACHE_NEGATIVE_TTL,
+        )
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker(BACKEND_BREAKER_THRESHOLD, BACKEND_BREAKER_RESET)
+        # One request per pooled connection; the rest wait briefly or fail fast
+        self.bulkhead = Bulkhead(max_connections, max_waiting, wait_timeout)
+        # Concurrent identical reads share one request (coalesce=False sends each)
+        self.flights = SingleFlight(coalesce)
+        self.retried = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        # Open the shared HTTP client (called from the Application post-init hook)
+        async with self._lock:
+            if self._client is None or self._client.is_closed:
+                # Limits and HTTP/2 are transport settings once a transport is passed
+                transport = self.transport or httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2)
+                self._client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    transport=InstrumentedTransport(transport),
+                )
+
+    async def close(self) -> None:
+        # Close the shared HTTP client and release pooled connections
+        async with self._lock:
+            if self._client is not None:
+                await self._client.aclose()
+                self._client = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Lazily open the client if start() has not been called yet
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        return self._client
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache, coalescing, retry and circuit breaker counters."""
+        return {
+            "cache": self.cache.stats(),
+            "coalesced": self.flights.coalesced,
+            "retried": self.retried,
+            "breaker_state": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "breaker_rejected": self.breaker.rejected,
+            "bulkhead_rejected": self.bulkhead.rejected,
+        }
+
+    async def _request(self, method: str, url: str, *, idempotent: bool = False, timeout: Optional[float] = None, **kwargs: Any) -> httpx.Response:
+        # Send through the circuit breaker and bulkhead; idempotent calls are retried with backoff
+        client = await self._get_client()
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            self.breaker.check()
             try:
-                response = await client.delete(f"{self.base_url}/users/telegram/{telegram_username}")
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                print(f"Error deleting user by Telegram username: {e}")
-                return None
\ No newline at end of file
+                async with self.bulkhead:
+                    response = await client.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                if attempt + 1 == attempts:
+                    raise
+                delay = backoff_delay(attempt, self.retry_backoff, self.retry_backoff_max)
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code not in RETRY_STATUSES or attempt + 1 == attempts:
+                    return response
+                delay = retry_after(response)
+                if delay is None:
+                    delay = backoff_delay(attempt, self.retry_backoff, self.retry_backoff_max)
+                elif delay > self.retry_backoff_max:
+                    # Not worth holding the handler for; let the caller report it
+                    return response
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+    @timed
+    async def create_user(self, user_data: Dict[str, Any], timeout: Optional[float] = None) -> Optional[dict]:
+        # Create a new user via API (not retried: a lost response would turn into a 409)
+        try:
+            # The username header lets the backend rate-limit sign-ups per user
+            headers = {"X-Telegram-Username": str(user_data.get("telegram_username", ""))}
+            response = await self._request("POST", "/users/", json=user_data, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            user = response.json()
+            self.cache.put(user["telegram_username"], user, response.headers.get("ETag"))
+            return user
+        except httpx.HTTPError as e:
+            self.cache.invalidate(user_data.get("telegram_username"))
+            print(f"Error creating user: {e}")
+            return None
+
+    @timed
+    async def get_user_by_telegram_username(self, telegram_username: str, timeout: Optional[float] = None) -> Optional[dict]:
+        cached = self.cache.get(telegram_username)
+        if cached is NOT_REGISTERED:
+            return None
+        if cached is not None:
+            return cached
+
+        # Concurrent lookups of the same user share one backend request
+        user = await self.flights.do(("user", telegram_username), lambda: self._fetch_user(telegram_username, timeout))
+        return dict(user) if user is not None else None
+
+    async def _fetch_user(self, telegram_username: str, timeout: Optional[float]) -> Optional[dict]:
+        # Revalidate an expired copy instead of downloading it again
+        headers = {}
+        stale = self.cache.validator(telegram_username)
+        if stale is not None:
+            headers["If-None-Match"] = stale[0]
+
+        try:
+            response = await self._request("GET", f"/users/telegram/{telegram_username}", idempotent=True, headers=headers, timeout=timeout)
+            if response.status_code == 304:
+                revalidated = self.cache.revalidated(telegram_username)
+                if revalidated is not None:
+                    return revalidated
+                # Evicted meanwhile: fetch unconditionally
+                response = await self._request("GET", f"/users/telegram/{telegram_username}", idempotent=True, timeout=timeout)
+            if response.status_code == 404:
+                self.cache.put_not_registered(telegram_username)
+            response.raise_for_status()
+            user = response.json()
+            self.cache.put(telegram_username, user, response.headers.get("ETag"))
+            return user
+        except httpx.HTTPError as e:
+            print(f"Error fetching user by Telegram username: {e}")
+            return None
+
+    @timed
+    async def update_user_by_telegram_username (self, telegram_username: str, user_data: Dict[str, Any], timeout: Optional[float] = None) -> Optional[dict]:
+        try:
+            response = await self._request("PUT", f"/users/telegram/{telegram_username}", idempotent=True, json=user_data, timeout=timeout)
+            response.raise_for_status()
+            user = response.json()
+            # A full update may rename the user, so drop the old key first
+            self.cache.invalidate(telegram_username)
+            self.cache.put(user["telegram_username"], user, response.headers.get("ETag"))
+            return user
+        except httpx.HTTPError as e:
+            self.cache.invalidate(telegram_username)
+            print(f"Error updating user by Telegram username: {e}")
+            return None
+
+    @timed
+    async def patch_user_by_telegram_username(self, telegram_username: str, fields: Dict[str, Any], timeout: Optional[float] = None) -> Optional[dict]:
+        # Send only the changed fields; the backend writes them in a single UPDATE
+        # (absolute values, so retrying is safe)
+        try:
+            response = await self._request("PATCH", f"/users/telegram/{telegram_username}", idempotent=True, json=fields, timeout=timeout)
+            response.raise_for_status()
+            user = response.json()
+            self.cache.put(telegram_username, user, response.headers.get("ETag"))
+            return user
+        except httpx.HTTPError as e:
+            self.cache.invalidate(telegram_username)
+            print(f"Error patching user by Telegram username: {e}")
+            return None
+
+    @timed
+    async def delete_user_by_telegram_username(self, telegram_username: str, timeout: Optional[float] = None) -> Optional[dict]:
+        # Not retried: a retry after a lost response would report 404 for a successful delete
+        try:
+            response = await self._request("DELETE", f"/users/telegram/{telegram_username}", timeout=timeout)
+            response.raise_for_status()
+            self.cache.put_not_registered(telegram_username)
+            return response.json()
+        except httpx.HTTPError as e:
+            self.cache.invalidate(telegram_username)
+            print(f"Error deleting user by Telegram username: {e}")
+            return None
+
+    @timed
+    async def batch_get_users(self, telegram_usernames: List[str], timeout: Optional[float] = None) -> Optional[Dict[str, dict]]:
+        # Profiles by username; cached entries are served locally and only misses are fetched
+        found: Dict[str, dict] = {}
+        missing = []
+        for telegram_username in dict.fromkeys(telegram_usernames):
+            cached = self.cache.get(telegram_username)
+            if cached is NOT_REGISTERED:
+                continue
+            if cached is not None:
+                found[telegram_username] = cached
+            else:
+                missing.append(telegram_username)
+        if not missing:
+            return found
+
+        try:
+            # A read despite the POST, so it is retried like one
+            response = await self._request("POST", "/users/batch-get", idempotent=True, json={"telegram_usernames": missing}, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+        except httpx.HTTPError as e:
+            print(f"Error fetching users in batch: {e}")
+            return None
+
+        for user in result["users"]:
+            self.cache.put(user["telegram_username"], user)
+            found[user["telegram_username"]] = user
+        for error in result["errors"]:
+            self.cache.put_not_registered(error["telegram_username"])
+        return found
+
+    @timed
+    async def bulk_create_users(self, users: List[Dict[str, Any]], timeout: Optional[float] = None) -> Optional[dict]:
+        # Import many profiles in one request; returns the created count and per-row errors
+        body = "\n".join(json.dumps(user) for user in users)
+        try:
+            response = await self._request(
+                "POST",
+                "/users/bulk",
+                content=body.encode(),
+                headers={"Content-Type": "application/x-ndjson"},
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            result = response.json()
+        except httpx.HTTPError as e:
+            print(f"Error creating users in bulk: {e}")
+            return None
+
+        # Created rows replace any "not registered" entries
+        for user in users:
+            self.cache.invalidate(user.get("telegram_username"))
+        return result
+
+    @timed
+    async def get_matches_by_telegram_username(self, telegram_username: str, limit: int = 5, gender: Optional[str] = None, timeout: Optional[float] = None) -> Optional[List[dict]]:
+        # Best matching candidates, best first (not cached: scores change as users join)
+        params = {"limit": limit}
+        if gender is not None:
+            params["gender"] = gender
+        matches = await self.flights.do(
+            ("matches", telegram_username, limit, gender),
+            lambda: self._fetch_matches(telegram_username, params, timeout),
+        )
+        return [dict(match) for match in matches] if matches is not None else None
+
+    async def _fetch_matches(self, telegram_username: str, params: Dict[str, Any], timeout: Optional[float]) -> Optional[List[dict]]:
+        try:
+            response = await self._request("GET", f"/users/telegram/{telegram_username}/matches", idempotent=True, params=params, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"Error fetching matches by Telegram username: {e}")
+            return None
+
+    @timed
+    async def record_swipes(self, swipes: List[Dict[str, Any]], timeout: Optional[float] = None) -> Optional[dict]:
+        # Record like/pass swipes in one request; returns the mutual matches they completed
+        try:
+            headers = {"X-Telegram-Username": str(swipes[0]["swiper"])} if swipes else {}
+            response = await self._request("POST", "/likes", json={"swipes": swipes}, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"Error recording swipes: {e}")
+            return None
+
+    @timed
+    async def get_mutuals_by_telegram_username(self, telegram_username: str, limit: int = 50, cursor: Optional[str] = None, timeout: Optional[float] = None) -> Optional[dict]:
+        # One page of mutual matches, newest first; pass ``next_cursor`` back for the next page
+        params: Dict[str, Any] = {"limit": limit}
+        if cursor is not None:
+            params["cursor"] = cursor
+        try:
+            response = await self._request("GET", f"/users/telegram/{telegram_username}/mutuals", idempotent=True, params=params, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"Error fetching mutual matches: {e}")
+            return None
+
+# Shared client used by every command handler
+api_client = NTUMatchAPI()
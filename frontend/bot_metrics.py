@@ -0,0 +1,280 @@
+"""Low-overhead timing for bot handlers and backend API calls.
+
+Every handler registered in ``main.py`` is wrapped by ``instrument`` and
+labelled by command, conversation state and callback; ``NTUMatchAPI`` times
+each public method with ``timed`` and each HTTP exchange through
+``InstrumentedTransport``. Samples go into fixed-bucket histograms (one
+``bisect`` and a few additions per observation), all updated on the event
+loop so no locks are needed.
+
+``MetricsReporter`` logs a one-line JSON summary of the last interval every
+``BOT_METRICS_LOG_INTERVAL`` seconds and, when ``BOT_METRICS_PORT`` is set,
+serves the cumulative histograms in Prometheus text format on localhost.
+"""
+from bisect import bisect_left
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+
+import httpx
+from telegram.ext import BaseHandler, CommandHandler, ConversationHandler
+
+logger = logging.getLogger(__name__)
+
+# Seconds between summary log lines (0 disables them)
+BOT_METRICS_LOG_INTERVAL = float(os.getenv("BOT_METRICS_LOG_INTERVAL", "60"))
+# Local port for the Prometheus endpoint (unset disables it)
+BOT_METRICS_PORT = os.getenv("BOT_METRICS_PORT")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Timings:
+    """Latency histogram plus error count for each label tuple.
+
+    A series is ``[bucket counts..., +Inf count, sum, errors]``.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, seconds: float, label_values: Tuple[str, ...], error: bool = False) -> None:
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0.0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-2] += seconds
+        if error:
+            series[-1] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List[float]]:
+        return {key: list(series) for key, series in self.series.items()}
+
+    def summary(self, previous: Dict[Tuple[str, ...], List[float]]) -> List[Dict[str, Any]]:
+        """Per-series count, errors and approximate percentiles since ``previous``."""
+        rows = []
+        for key, series in sorted(self.series.items()):
+            before = previous.get(key)
+            delta = series if before is None else [now - then for now, then in zip(series, before)]
+            count = sum(delta[:-2])
+            if not count:
+                continue
+            row: Dict[str, Any] = dict(zip(self.labels, key))
+            row.update(
+                count=int(count),
+                errors=int(delta[-1]),
+                mean_ms=round(delta[-2] / count * 1000, 1),
+                p50_ms=self._quantile(delta, count, 0.50),
+                p95_ms=self._quantile(delta, count, 0.95),
+                p99_ms=self._quantile(delta, count, 0.99),
+            )
+            rows.append(row)
+        return rows
+
+    def _quantile(self, delta: List[float], count: float, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th sample (None past the last bound)
+        seen = 0.0
+        for bound, bucket in zip(self.buckets, delta):
+            seen += bucket
+            if seen >= q * count:
+                return bound * 1000
+        return None
+
+    def render(self) -> List[str]:
+        name = f"{self.name}_seconds"
+        lines = [f"# HELP {name} {self.help_text}", f"# TYPE {name} histogram"]
+        errors = [f"# HELP {self.name}_errors_total Failed samples of {name}.", f"# TYPE {self.name}_errors_total counter"]
+        for key, series in sorted(self.series.items()):
+            labels = ",".join(f'{label}="{value}"' for label, value in zip(self.labels, key))
+            cumulative = 0.0
+            for bound, bucket in zip(self.buckets, series):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative:g}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative:g}')
+            lines.append(f"{name}_sum{{{labels}}} {series[-2]:g}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative:g}")
+            errors.append(f"{self.name}_errors_total{{{labels}}} {series[-1]:g}")
+        return lines + errors
+
+class StatusCounter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.counts: Dict[Tuple[str, str], int] = {}
+
+    def inc(self, endpoint: str, status: str) -> None:
+        key = (endpoint, status)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for (endpoint, status), count in sorted(self.counts.items()):
+            lines.append(f'{self.name}{{endpoint="{endpoint}",status="{status}"}} {count}')
+        return lines
+
+handler_timings = Timings("bot_handler", "Bot handler latency.", ("command", "state", "callback"))
+api_method_timings = Timings("bot_api_method", "NTUMatchAPI method latency, including cache hits.", ("method",))
+http_timings = Timings("bot_backend_request", "Backend HTTP request latency, to response headers.", ("endpoint",))
+http_statuses = StatusCounter("bot_backend_responses_total", "Backend responses by status code ('error' for transport failures).")
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in (handler_timings, api_method_timings, http_timings, http_statuses):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Handlers
+
+def _timed_callback(callback: Callable, labels: Tuple[str, ...]) -> Callable:
+    @wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            result = await callback(update, context)
+        except Exception:
+            handler_timings.observe(time.perf_counter() - start, labels, error=True)
+            raise
+        handler_timings.observe(time.perf_counter() - start, labels)
+        return result
+    wrapper.timed = True
+    return wrapper
+
+def _wrap(handler: BaseHandler, command: str, state: str) -> None:
+    if isinstance(handler, ConversationHandler):
+        instrument(handler)
+        return
+    if getattr(handler.callback, "timed", False):
+        return
+    handler.callback = _timed_callback(handler.callback, (command, state, handler.callback.__name__))
+
+def instrument(handler: BaseHandler) -> BaseHandler:
+    """Time ``handler``'s callbacks in place; conversations are labelled per state."""
+    if not isinstance(handler, ConversationHandler):
+        command = sorted(handler.commands)[0] if isinstance(handler, CommandHandler) else type(handler).__name__
+        _wrap(handler, command, "-")
+        return handler
+
+    entry = handler.entry_points[0]
+    command = sorted(entry.commands)[0] if isinstance(entry, CommandHandler) else type(entry).__name__
+    for entry_point in handler.entry_points:
+        _wrap(entry_point, command, "entry")
+    for state, state_handlers in handler.states.items():
+        for state_handler in state_handlers:
+            _wrap(state_handler, command, str(state))
+    for fallback in handler.fallbacks:
+        _wrap(fallback, command, "fallback")
+    return handler
+
+# Backend API
+
+def timed(method: Callable) -> Callable:
+    """Time an ``NTUMatchAPI`` coroutine method (HTTP failures show up per endpoint)."""
+    labels = (method.__name__,)
+
+    @wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await method(*args, **kwargs)
+        except Exception:
+            api_method_timings.observe(time.perf_counter() - start, labels, error=True)
+            raise
+        api_method_timings.observe(time.perf_counter() - start, labels)
+        return result
+    return wrapper
+
+_USERNAME_PATH = re.compile(r"^/users/telegram/[^/]+")
+
+def endpoint_template(method: str, path: str) -> str:
+    """``GET /users/telegram/{telegram_username}`` instead of one label per user."""
+    return f"{method} {_USERNAME_PATH.sub('/users/telegram/{telegram_username}', path)}"
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport to record per-endpoint latency and status codes."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = endpoint_template(request.method, request.url.path)
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            http_timings.observe(time.perf_counter() - start, (endpoint,), error=True)
+            http_statuses.inc(endpoint, "error")
+            raise
+        http_timings.observe(time.perf_counter() - start, (endpoint,), error=response.status_code >= 500)
+        http_statuses.inc(endpoint, str(response.status_code))
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+# Reporting
+
+class MetricsReporter:
+    """Periodic JSON summary log line and optional local Prometheus endpoint."""
+
+    def __init__(self, interval: float = BOT_METRICS_LOG_INTERVAL, port: Optional[str] = BOT_METRICS_PORT):
+        self.interval = interval
+        self.port = int(port) if port else None
+        self._task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._previous: Dict[str, Dict] = {}
+
+    async def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._log_periodically())
+        if self.port is not None:
+            self._server = await asyncio.start_server(self._serve, "127.0.0.1", self.port)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.log_summary()
+
+    def log_summary(self) -> None:
+        summary = {}
+        for key, timings in (("handlers", handler_timings), ("api_methods", api_method_timings), ("backend_requests", http_timings)):
+            rows = timings.summary(self._previous.get(key, {}))
+            self._previous[key] = timings.snapshot()
+            if rows:
+                summary[key] = rows
+        if summary:
+            logger.info("Bot metrics: %s", json.dumps(summary, separators=(",", ":")))
+
+    async def _log_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.log_summary()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Minimal HTTP/1.0: answer any request with the current metrics
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = render().encode()
+            writer.write(
+                b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
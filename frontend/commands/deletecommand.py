@@ -1,12 +1,12 @@
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
-from api_client import NTUMatchAPI
+from api_client import api_client
+from conversation_state import IdleConversationHandler
+from persistence import PERSISTENT
 
 # States for conversation handlers
 DELETE_CONFIRMATION = 0
 
-api_client = NTUMatchAPI()
-
 async def delete (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the delete process"""
     telegram_username = update.effective_user.username  
@@ -51,10 +51,12 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("Operation cancelled.", reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
 
-delete_handler = ConversationHandler(
+delete_handler = IdleConversationHandler(
     entry_points=[CommandHandler("delete", delete)],
     states={
         DELETE_CONFIRMATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, delete_confirmation)],
     },
     fallbacks=[CommandHandler("cancel", cancel)],
+    name="delete",
+    persistent=PERSISTENT,
 )
\ No newline at end of file
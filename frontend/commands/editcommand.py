@@ -1,11 +1,19 @@
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CommandHandler, filters
-from api_client import NTUMatchAPI
+from api_client import api_client
+from conversation_state import EditState, IdleConversationHandler, UserState
+from persistence import PERSISTENT
 
 # States for conversation handlers
 EDIT_SELECTION, EDIT_AGE, EDIT_HOBBY, EDIT_DESCRIPTION, EDIT_PICTURE = range(5)
 
-api_client = NTUMatchAPI()
+# Menu option -> (profile field, state that asks for its new value, prompt)
+EDIT_OPTIONS = {
+    "Edit Age": ("age", EDIT_AGE, "Please enter your new age:"),
+    "Edit Hobby": ("hobby", EDIT_HOBBY, "Please enter your new hobby:"),
+    "Edit Description": ("description", EDIT_DESCRIPTION, "Please enter your new description:"),
+    "Edit Picture": ("picture_id", EDIT_PICTURE, "Please send your new profile picture:"),
+}
 
 async def edit (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the edit process"""
@@ -17,6 +25,11 @@ async def edit (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         await update.message.reply_text("You are not registered yet. Please use /start to register.")
         return ConversationHandler.END
 
+    return await show_edit_menu(update, context)
+
+async def show_edit_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Show the edit options without re-checking registration"""
+    context.user_data.end_edit()
     reply_keyboard = [["Edit Age", "Edit Hobby"], ["Edit Description", "Edit Picture"], ["Cancel"]]
 
     await update.message.reply_text(
@@ -30,111 +43,80 @@ async def edit (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def edit_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle the user's selection for editing"""
     selection = update.message.text
-    if selection == "Edit Age":
-        await update.message.reply_text("Please enter your new age:", reply_markup=ReplyKeyboardRemove())
-        return EDIT_AGE
-    elif selection == "Edit Hobby":
-        await update.message.reply_text("Please enter your new hobby:", reply_markup=ReplyKeyboardRemove())
-        return EDIT_HOBBY
-    elif selection == "Edit Description":
-        await update.message.reply_text("Please enter your new description:", reply_markup=ReplyKeyboardRemove())
-        return EDIT_DESCRIPTION
-    elif selection == "Edit Picture":
-        await update.message.reply_text("Please send your new profile picture:", reply_markup=ReplyKeyboardRemove())
-        return EDIT_PICTURE
+    if selection in EDIT_OPTIONS:
+        field, state, prompt = EDIT_OPTIONS[selection]
+        context.user_data.edit = EditState(field)
+        await update.message.reply_text(prompt, reply_markup=ReplyKeyboardRemove())
+        return state
     elif selection == "Cancel":
+        context.user_data.end_edit()
         await update.message.reply_text("Edit cancelled.", reply_markup=ReplyKeyboardRemove())
         return ConversationHandler.END
     else:
         await update.message.reply_text("Invalid selection. Please choose again.")
         return EDIT_SELECTION
 
+# How each profile field is named in replies
+FIELD_LABELS = {"age": "age", "hobby": "hobby", "description": "description", "picture_id": "profile picture"}
+
+async def save_edit(update: Update, context: ContextTypes.DEFAULT_TYPE, value) -> int:
+    """Save the new value of the field chosen in the menu (``context.user_data.edit``)"""
+    edit_state = context.user_data.edit
+    if edit_state is None:
+        # No field chosen (e.g. the conversation outlived its state); ask again
+        return await show_edit_menu(update, context)
+
+    label = FIELD_LABELS[edit_state.field]
+    result = await api_client.patch_user_by_telegram_username(
+        telegram_username=update.effective_user.username,
+        fields={edit_state.field: value}
+    )
+    if result:
+        await update.message.reply_text(f"Your {label} has been updated. What else would you like to edit?", reply_markup=ReplyKeyboardRemove())
+    else:
+        await update.message.reply_text(f"Failed to update {label}. Please try again later.")
+    return await show_edit_menu(update, context)
+
 async def edit_age(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Edit user's age"""
     try:
         updated_age = int(update.message.text)
-        if updated_age < 16 or updated_age > 30:
-            await update.message.reply_text("Please enter a valid age (16-30):")
-            return EDIT_AGE
-        
-        user_data = await api_client.get_user_by_telegram_username(update.effective_user.username)
-        user_data["age"] = updated_age
-        result = await api_client.update_user_by_telegram_username(
-            telegram_username=update.effective_user.username,
-            user_data=user_data
-        )
-        if result:
-            await update.message.reply_text(f"Your age has been updated to {updated_age}. What else would you like to edit?", reply_markup=ReplyKeyboardRemove())
-        else:
-            await update.message.reply_text("Failed to update age. Please try again later.")
     except ValueError:
         await update.message.reply_text("Invalid input. Please enter a valid age (16-30):")
         return EDIT_AGE
-    return await edit(update, context)
-
-async def edit_hobby (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Edit user's hobby"""
-    updated_hobby = update.message.text
-    user_data = await api_client.get_user_by_telegram_username(update.effective_user.username)
-    user_data["hobby"] = updated_hobby
-    result = await api_client.update_user_by_telegram_username(
-        telegram_username=update.effective_user.username,
-        user_data=user_data
-    )
-    if result:
-        await update.message.reply_text(f"Your hobby has been updated. What else would you like to edit?", reply_markup=ReplyKeyboardRemove())
-    else:
-        await update.message.reply_text("Failed to update hobby. Please try again later.")
-    return await edit(update, context)
+    if updated_age < 16 or updated_age > 30:
+        await update.message.reply_text("Please enter a valid age (16-30):")
+        return EDIT_AGE
+    return await save_edit(update, context, updated_age)
 
-async def edit_description (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Edit user's description"""
-    updated_description = update.message.text
-    user_data = await api_client.get_user_by_telegram_username(update.effective_user.username)
-    user_data["description"] = updated_description
-    result = await api_client.update_user_by_telegram_username(
-        telegram_username=update.effective_user.username,
-        user_data=user_data
-    )
-    if result:
-        await update.message.reply_text(f"Your description has been updated. What else would you like to edit?", reply_markup=ReplyKeyboardRemove())
-    else:
-        await update.message.reply_text("Failed to update description. Please try again later.")
-    return await edit(update, context)
+async def edit_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Edit a free-text field (hobby or description)"""
+    return await save_edit(update, context, update.message.text)
 
 async def edit_picture (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Edit user's profile picture"""
     if not update.message.photo:
         await update.message.reply_text("Please send a valid photo.")
         return EDIT_PICTURE
-
-    photo_file = update.message.photo[-1]
-
-    user_data = await api_client.get_user_by_telegram_username(update.effective_user.username)
-    user_data["picture_id"] = photo_file.file_id
-    result = await api_client.update_user_by_telegram_username(
-        telegram_username=update.effective_user.username,
-        user_data=user_data
-    )
-    if result:
-        await update.message.reply_text(f"Your profile picture has been updated. What else would you like to edit?", reply_markup=ReplyKeyboardRemove())
-    else:
-        await update.message.reply_text("Failed to update profile picture. Please try again later.")
-    return await edit(update, context)
+    return await save_edit(update, context, update.message.photo[-1].file_id)
 
 async def cancel_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel the edit process"""
+    context.user_data.end_edit()
     await update.message.reply_text("Edit process cancelled.", reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
 
-edit_handler = ConversationHandler(
+edit_handler = IdleConversationHandler(
         entry_points=[CommandHandler("edit", edit)],
         states={
             EDIT_SELECTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_selection)],
             EDIT_AGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_age)],
-            EDIT_HOBBY: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_hobby)],
-            EDIT_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_description)],
+            EDIT_HOBBY: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_text)],
+            EDIT_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_text)],
             EDIT_PICTURE: [MessageHandler(filters.PHOTO, edit_picture)],
         },
         fallbacks=[CommandHandler("cancel", cancel_edit)],
+        name="edit",
+        persistent=PERSISTENT,
+        on_timeout=UserState.end_edit,
     )
\ No newline at end of file
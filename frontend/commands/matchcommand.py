@@ -0,0 +1,40 @@
+from telegram import Update
+from telegram.ext import ContextTypes, CommandHandler
+from api_client import api_client
+from delivery import delivery
+
+# Number of candidates shown per /match
+MATCH_LIMIT = 5
+
+async def match(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show the user's best matching profiles"""
+    telegram_username = update.effective_user.username
+
+    user = await api_client.get_user_by_telegram_username(telegram_username)
+    if not user:
+        await update.message.reply_text("❌ No profile found. Please register first using /start")
+        return
+
+    matches = await api_client.get_matches_by_telegram_username(telegram_username, limit=MATCH_LIMIT)
+    if matches is None:
+        await update.message.reply_text("❌ Error finding matches. Please try again later.")
+        return
+    if not matches:
+        await update.message.reply_text("No matches yet. Check back once more students have joined!")
+        return
+
+    await update.message.reply_text(f"Here are your top {len(matches)} matches:")
+    # One media group for all candidates instead of a photo message each
+    photos = [
+        (
+            candidate['picture_id'],
+            f"👤 **{candidate['name']}**, {candidate['age']}\n"
+            f"🎯 Hobbies: {candidate['hobby']}\n"
+            f"📝 About me: {candidate['description']}",
+        )
+        for candidate in matches
+    ]
+    # Queued, not awaited: the queue's senders wait out the flood limits, not this handler
+    await delivery.send_photos(context.bot, update.effective_chat.id, photos, wait=False, parse_mode='Markdown')
+
+match_handler = CommandHandler("match", match)
@@ -1,12 +1,10 @@
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler
-from api_client import NTUMatchAPI
+from api_client import api_client
 
 # Conversation States
 SHOW_PROFILE = range(1)
 
-api_client = NTUMatchAPI()
-
 async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Display user's profile with photo and data in a single message"""
     telegram_username = update.effective_user.username
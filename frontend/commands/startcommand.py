@@ -1,12 +1,19 @@
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
-from api_client import NTUMatchAPI
+from api_client import api_client
+from conversation_state import IdleConversationHandler, RegistrationState, UserState
+from persistence import PERSISTENT
 from commands.editcommand import edit
 
 # Conversation States
 PHOTO, NAME, EMAIL, AGE, GENDER, HOBBY, LOCATION, DESCRIPTION = range(8)
 
-api_client = NTUMatchAPI()
+# Halls offered at registration (the backend resolves these names to coordinates)
+CAMPUS_HALLS = [f"Hall {i}" for i in range(1, 17)] + [
+    "Crescent Hall", "Pioneer Hall", "Binjai Hall", "Tanjong Hall", "Banyan Hall",
+    "Saraca Hall", "Tamarind Hall", "Graduate Hall 1", "Graduate Hall 2",
+]
+SKIP_LOCATION = "Skip"
 
 async def start (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     # Check the telegram username inside the database
@@ -18,6 +25,7 @@ async def start (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
         await update.message.reply_text("Choose your next action:", reply_markup=reply_markup)
     else:
+        context.user_data.registration = RegistrationState()
         await update.message.reply_text("Hi, there !\nIt seems that you're new here. Please register to continue.")
         await update.message.reply_text("Please enter your NTU Email Address: ")
         return EMAIL
@@ -33,7 +41,7 @@ async def get_email(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         )
         return EMAIL
     
-    context.user_data['email'] = email
+    context.user_data.registration.email = email
 
     await update.message.reply_text("Great! Please select a photo for your profile:")
     return PHOTO
@@ -42,7 +50,7 @@ async def get_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Get user's profile photo"""  
     photo_file = update.message.photo[-1]
     file_id = photo_file.file_id
-    context.user_data['photo_file_id'] = file_id
+    context.user_data.registration.photo_file_id = file_id
 
     await update.message.reply_text("Great! Now, what's your full name?")
     return NAME
@@ -50,7 +58,7 @@ async def get_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def get_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Get user's full name"""
     name = update.message.text
-    context.user_data['name'] = name
+    context.user_data.registration.name = name
 
     await update.message.reply_text(f"Nice to meet you ! How old are you?")
     return AGE
@@ -63,7 +71,7 @@ async def get_age(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             await update.message.reply_text("Please enter a valid age (16-30):")
             return AGE
         
-        context.user_data['age'] = age
+        context.user_data.registration.age = age
 
         reply_keyboard = [["Male", "Female"]]
 
@@ -83,7 +91,7 @@ async def get_age(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def get_gender(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Get user's gender"""
     gender = update.message.text
-    context.user_data['gender'] = gender
+    context.user_data.registration.gender = gender
     await update.message.reply_text(
         "Almost done! Tell me about your hobbies or interests:", 
         reply_markup=ReplyKeyboardRemove()
@@ -91,29 +99,52 @@ async def get_gender(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return HOBBY
 
 async def get_hobby(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Get user's hobby and complete registration"""
+    """Get user's hobby"""
     hobby = update.message.text
-    context.user_data['hobby'] = hobby
+    context.user_data.registration.hobby = hobby
 
-    await update.message.reply_text("Great! Now, please provide a brief description about yourself:")
+    reply_keyboard = [[KeyboardButton("Share my location", request_location=True)]]
+    reply_keyboard += [CAMPUS_HALLS[i:i + 3] for i in range(0, len(CAMPUS_HALLS), 3)]
+    reply_keyboard.append([SKIP_LOCATION])
+    await update.message.reply_text(
+        "Where are you based? Share your location or pick your hall, so we can show you people nearby:",
+        reply_markup=ReplyKeyboardMarkup(
+            keyboard=reply_keyboard, one_time_keyboard=True, resize_keyboard=True, input_field_placeholder="Select your hall"
+        ),
+    )
+    return LOCATION
+
+async def get_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Get user's shared Telegram location"""
+    location = update.message.location
+    context.user_data.registration.latitude = location.latitude
+    context.user_data.registration.longitude = location.longitude
+    return await ask_description(update, context)
+
+async def get_location_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Get user's campus hall, or skip the question"""
+    location_name = update.message.text
+    if location_name != SKIP_LOCATION:
+        if location_name not in CAMPUS_HALLS:
+            await update.message.reply_text("Please share your location or pick a hall from the keyboard:")
+            return LOCATION
+        context.user_data.registration.location_name = location_name
+    return await ask_description(update, context)
+
+async def ask_description(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text(
+        "Great! Now, please provide a brief description about yourself:",
+        reply_markup=ReplyKeyboardRemove()
+    )
     return DESCRIPTION
 
 async def get_description (update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Get user's description"""
-    description = update.message.text
-    context.user_data['description'] = description
+    registration = context.user_data.registration
+    registration.description = update.message.text
 
     # Prepare user data for API
-    user_data = {
-        'telegram_username': str(update.effective_user.username),
-        'email': context.user_data['email'],
-        'name': context.user_data['name'],
-        'age': context.user_data['age'],
-        'gender': context.user_data['gender'],
-        'hobby': context.user_data['hobby'],
-        'description': context.user_data['description'],
-        'picture_id': context.user_data['photo_file_id']
-    }
+    user_data = registration.payload(str(update.effective_user.username))
     
     # Send to API
     result = await api_client.create_user(user_data)
@@ -121,7 +152,7 @@ async def get_description (update: Update, context: ContextTypes.DEFAULT_TYPE) -
     if result:
         await update.message.reply_text(
             f"Registration successful!\n\n"
-            f"Welcome to NTUMatch, {context.user_data['name']}!\n"
+            f"Welcome to NTUMatch, {registration.name}!\n"
             f"Your profile has been created. You can now start matching with other students!"
         )
     else:
@@ -130,18 +161,18 @@ async def get_description (update: Update, context: ContextTypes.DEFAULT_TYPE) -
             "Please try again later or contact support."
         )
     
-    # Clear user data
-    context.user_data.clear()
+    # Clear registration data
+    context.user_data.end_registration()
     return ConversationHandler.END
 
 async def cancel_registration(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel the registration process"""
     await update.message.reply_text("Registration cancelled. You can start again anytime with /start")
-    context.user_data.clear()
+    context.user_data.end_registration()
     return ConversationHandler.END
 
 # Registration conversation handler
-start_handler = ConversationHandler(
+start_handler = IdleConversationHandler(
     entry_points=[CommandHandler("start", start)],
     states={
         EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_email)],
@@ -150,7 +181,14 @@ start_handler = ConversationHandler(
         AGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_age)],
         GENDER: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_gender)],
         HOBBY: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_hobby)],
+        LOCATION: [
+            MessageHandler(filters.LOCATION, get_location),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, get_location_name),
+        ],
         DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_description)]
     },
     fallbacks=[CommandHandler("cancel", cancel_registration)],
+    name="registration",
+    persistent=PERSISTENT,
+    on_timeout=UserState.end_registration,
 )
\ No newline at end of file
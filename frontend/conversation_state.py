@@ -0,0 +1,198 @@
+"""Typed per-user conversation state and eviction of idle conversations.
+
+``UserState`` is the bot's ``context.user_data`` (``CONTEXT_TYPES`` in
+``main.py``). Each user gets one ``__slots__`` object holding the
+registration being filled in and the field being edited, instead of a
+free-form dict, so an in-progress conversation costs a few small objects.
+
+``IdleConversationHandler`` is a ``ConversationHandler`` that records when
+each conversation last moved. ``ConversationSweeper`` runs every
+``CONVERSATION_SWEEP_INTERVAL`` seconds and:
+
+* ends conversations idle for ``CONVERSATION_TIMEOUT`` seconds;
+* clears that conversation's part of the user's state;
+* drops states left empty.
+
+Abandoned registrations therefore no longer stay in memory, and the
+persistence learns of both changes on its next pass. PTB's own
+``conversation_timeout`` needs the job-queue extra and schedules a job per
+conversation; one sweep over all of them is cheaper.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+import asyncio
+import logging
+import os
+import time
+
+from telegram.ext import Application, CallbackContext, ContextTypes, ConversationHandler
+
+logger = logging.getLogger(__name__)
+
+# Seconds a conversation may sit idle before it is ended (0 disables eviction)
+CONVERSATION_TIMEOUT = float(os.getenv("CONVERSATION_TIMEOUT", "1800"))
+# Seconds between sweeps for idle conversations
+CONVERSATION_SWEEP_INTERVAL = float(os.getenv("CONVERSATION_SWEEP_INTERVAL", "60"))
+
+ConversationKey = Tuple[Any, ...]
+
+class RegistrationState:
+    """Answers collected so far by the /start registration conversation."""
+
+    __slots__ = ("email", "photo_file_id", "name", "age", "gender", "hobby", "latitude", "longitude", "location_name", "description")
+
+    def __init__(self, **fields: Any):
+        for slot in self.__slots__:
+            setattr(self, slot, fields.get(slot))
+
+    def payload(self, telegram_username: str) -> Dict[str, Any]:
+        """Body for ``POST /users/`` (location keys only when given)."""
+        user_data = {
+            'telegram_username': telegram_username,
+            'email': self.email,
+            'name': self.name,
+            'age': self.age,
+            'gender': self.gender,
+            'hobby': self.hobby,
+            'description': self.description,
+            'picture_id': self.photo_file_id,
+        }
+        for key in ('latitude', 'longitude', 'location_name'):
+            if getattr(self, key) is not None:
+                user_data[key] = getattr(self, key)
+        return user_data
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__ if getattr(self, slot) is not None}
+
+class EditState:
+    """The profile field the /edit conversation is changing."""
+
+    __slots__ = ("field",)
+
+    def __init__(self, field: Optional[str] = None):
+        self.field = field
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"field": self.field}
+
+class UserState:
+    """``context.user_data``: one slot per conversation that keeps data between steps."""
+
+    __slots__ = ("registration", "edit")
+
+    def __init__(self, registration: Optional[RegistrationState] = None, edit: Optional[EditState] = None):
+        self.registration = registration
+        self.edit = edit
+
+    @property
+    def is_empty(self) -> bool:
+        return self.registration is None and self.edit is None
+
+    def clear(self) -> None:
+        self.registration = None
+        self.edit = None
+
+    def end_registration(self) -> None:
+        self.registration = None
+
+    def end_edit(self) -> None:
+        self.edit = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        if self.registration is not None:
+            data["registration"] = self.registration.to_dict()
+        if self.edit is not None:
+            data["edit"] = self.edit.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserState":
+        registration = data.get("registration")
+        edit = data.get("edit")
+        return cls(
+            RegistrationState(**registration) if registration is not None else None,
+            EditState(**edit) if edit is not None else None,
+        )
+
+CONTEXT_TYPES = ContextTypes(context=CallbackContext, user_data=UserState)
+
+class IdleConversationHandler(ConversationHandler):
+    """``ConversationHandler`` whose idle conversations ``ConversationSweeper`` can end.
+
+    ``on_timeout`` receives the user's ``UserState`` when a conversation is
+    ended for being idle, to clear the data that conversation kept.
+    """
+
+    __slots__ = ("last_active", "on_timeout")
+
+    def __init__(self, *args: Any, on_timeout: Optional[Callable[[UserState], None]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.last_active: Dict[ConversationKey, float] = {}
+        self.on_timeout = on_timeout
+
+    async def handle_update(self, update, application, check_result, context):
+        key = check_result[1]
+        try:
+            return await super().handle_update(update, application, check_result, context)
+        finally:
+            if key in self._conversations:
+                self.last_active[key] = time.monotonic()
+            else:
+                self.last_active.pop(key, None)
+
+    def active_keys(self) -> List[ConversationKey]:
+        return list(self._conversations)
+
+    def evict_idle(self, application: Application, now: float, timeout: float) -> int:
+        """End conversations idle for ``timeout`` seconds; returns how many."""
+        # Conversations restored from persistence start their idle time at the first sweep
+        idle = [key for key in self._conversations if now - self.last_active.setdefault(key, now) >= timeout]
+        for key in idle:
+            self._update_state(self.END, key)
+            user_id = key[-1] if self.per_user else None
+            if self.on_timeout is not None and user_id in application.user_data:
+                self.on_timeout(application.user_data[user_id])
+        # Forget conversations that ended since the last sweep
+        for key in [key for key in self.last_active if key not in self._conversations]:
+            del self.last_active[key]
+        return len(idle)
+
+class ConversationSweeper:
+    """Periodically ends idle conversations and drops empty ``UserState``s."""
+
+    def __init__(self, handlers: Sequence[IdleConversationHandler], timeout: float = CONVERSATION_TIMEOUT, interval: float = CONVERSATION_SWEEP_INTERVAL):
+        self.handlers = list(handlers)
+        self.timeout = timeout
+        self.interval = interval
+        self.evicted = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, application: Application) -> None:
+        if self.timeout > 0 and self.interval > 0:
+            self._task = asyncio.create_task(self._sweep_periodically(application))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def sweep(self, application: Application, now: Optional[float] = None) -> Tuple[int, int]:
+        """One pass; returns ``(conversations ended, user states dropped)``."""
+        now = time.monotonic() if now is None else now
+        evicted = sum(handler.evict_idle(application, now, self.timeout) for handler in self.handlers)
+        in_conversation: Set[Any] = {key[-1] for handler in self.handlers for key in handler.active_keys()}
+        empty = [user_id for user_id, state in application.user_data.items() if state.is_empty and user_id not in in_conversation]
+        for user_id in empty:
+            application.drop_user_data(user_id)
+        self.evicted += evicted
+        self.dropped += len(empty)
+        return evicted, len(empty)
+
+    async def _sweep_periodically(self, application: Application) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            evicted, dropped = self.sweep(application)
+            if evicted:
+                logger.info("Ended %d idle conversations, dropped %d empty user states", evicted, dropped)
@@ -0,0 +1,385 @@
+"""Outbound delivery within Telegram's flood limits.
+
+``FloodLimiter`` paces the calls ``DeliveryQueue`` makes (it can also be a
+bot's ``rate_limiter``). Replies a handler sends directly are not paced: the
+user is waiting for them, and sleeping in the handler for the chat's bucket
+would hold up every update queued behind it. A paced call first takes a
+token from its chat's bucket and then from the global bucket:
+
+* private chats get ``DELIVERY_CHAT_RATE`` messages/sec, with bursts of
+  ``DELIVERY_CHAT_BURST``;
+* groups and channels get ``DELIVERY_GROUP_PER_MINUTE`` messages/min;
+* the global bucket allows ``DELIVERY_GLOBAL_RATE`` messages/sec.
+
+Callers wait for their turn instead of being refused. A ``RetryAfter``
+from Telegram pauses all sends for the time it asks, and the call is
+retried up to ``DELIVERY_MAX_RETRIES`` times.
+
+``DeliveryQueue`` fans messages out through the bot, and the waiting happens
+in its senders, not in the handlers that queued the messages:
+
+* it keeps a FIFO per chat and serves chats round-robin with
+  ``DELIVERY_WORKERS`` senders, so a long list for one chat does not hold
+  up the others;
+* photos queued back to back for a chat (without their own keyboard) go
+  out as one ``send_media_group`` of up to ``MEDIA_GROUP_MAX`` photos, so a
+  list of profiles costs one call and one flood-limit token instead of one
+  per profile;
+* at most ``DELIVERY_MAX_PENDING`` messages wait at once; senders beyond
+  that wait for room.
+
+Everything runs on the event loop, so no locks are needed.
+"""
+from collections import deque
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Coroutine, Deque, Dict, List, Optional, Sequence, Tuple, Union
+import asyncio
+import logging
+import os
+import time
+
+from telegram import Bot, InputMediaPhoto, Message
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Telegram's published limits: about 30 messages/sec overall, one per second in a chat
+# (short bursts tolerated) and 20 per minute in a group
+DELIVERY_GLOBAL_RATE = float(os.getenv("DELIVERY_GLOBAL_RATE", "30"))
+DELIVERY_CHAT_RATE = float(os.getenv("DELIVERY_CHAT_RATE", "1"))
+DELIVERY_CHAT_BURST = float(os.getenv("DELIVERY_CHAT_BURST", "3"))
+DELIVERY_GROUP_PER_MINUTE = float(os.getenv("DELIVERY_GROUP_PER_MINUTE", "20"))
+# Retries of a call that Telegram answered with RetryAfter
+DELIVERY_MAX_RETRIES = int(os.getenv("DELIVERY_MAX_RETRIES", "3"))
+# Concurrent sends from the queue, and messages allowed to wait in it
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "16"))
+DELIVERY_MAX_PENDING = int(os.getenv("DELIVERY_MAX_PENDING", "10000"))
+# Seconds shutdown waits for queued messages to go out
+DELIVERY_DRAIN_TIMEOUT = float(os.getenv("DELIVERY_DRAIN_TIMEOUT", "10"))
+
+# Telegram accepts 2-10 items per media group
+MEDIA_GROUP_MAX = 10
+# Idle chat buckets are pruned once this many chats are tracked
+MAX_TRACKED_CHATS = 100_000
+
+ChatId = Union[int, str]
+
+def retry_seconds(error: RetryAfter) -> float:
+    """``error.retry_after`` in seconds (an int or a timedelta, depending on PTB settings)."""
+    value = error.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+def is_group(chat_id: ChatId) -> bool:
+    # Private chats have positive ids; groups and channels negative ids or an @username
+    return isinstance(chat_id, str) or chat_id < 0
+
+class Buckets:
+    """Token buckets by key that hand out reservations instead of refusals.
+
+    ``reserve`` always takes a token, letting the bucket go negative, and
+    returns how long the caller must wait before using it. Waiters are
+    therefore served in the order they arrived, and nobody wakes up only to
+    find the token taken.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = MAX_TRACKED_CHATS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[Any, List[float]] = {}
+
+    def reserve(self, key: Any, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate) - 1
+        bucket[0], bucket[1] = tokens, now
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def _prune(self, now: float) -> None:
+        # A bucket that has refilled completely carries no state worth keeping
+        self._buckets = {key: b for key, b in self._buckets.items() if b[0] + (now - b[1]) * self.rate < self.burst}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class FloodLimiter(BaseRateLimiter[int]):
+    """Paces Bot API calls to Telegram's limits and honours ``RetryAfter``.
+
+    ``call`` runs one send for a chat. As a bot's ``rate_limiter``, calls
+    without a ``chat_id`` (``getUpdates``, ``answerCallbackQuery``, ...) are
+    not limited, and ``rate_limit_args`` may give a per-call ``max_retries``.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = DELIVERY_GLOBAL_RATE,
+        chat_rate: float = DELIVERY_CHAT_RATE,
+        chat_burst: float = DELIVERY_CHAT_BURST,
+        group_per_minute: float = DELIVERY_GROUP_PER_MINUTE,
+        max_retries: int = DELIVERY_MAX_RETRIES,
+    ):
+        self.global_bucket = Buckets(global_rate, max(global_rate, 1.0))
+        self.chat_buckets = Buckets(chat_rate, chat_burst)
+        self.group_buckets = Buckets(group_per_minute / 60, group_per_minute)
+        self.max_retries = max_retries
+        # Monotonic time before which nothing is sent (set by RetryAfter)
+        self.paused_until = 0.0
+        self.calls = 0
+        self.delayed = 0
+        self.flood_waits = 0
+        self.retries = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Any:
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+        return await self.call(chat_id, lambda: callback(*args, **kwargs), endpoint, rate_limit_args)
+
+    async def call(self, chat_id: ChatId, send: Callable[[], Awaitable[Any]], endpoint: str, max_retries: Optional[int] = None) -> Any:
+        """Await ``send()`` once ``chat_id`` and the bot have a token, retrying after ``RetryAfter``."""
+        max_retries = self.max_retries if max_retries is None else max_retries
+        self.calls += 1
+        attempt = 0
+        while True:
+            await self._take(chat_id)
+            try:
+                return await send()
+            except RetryAfter as error:
+                seconds = retry_seconds(error)
+                self.flood_waits += 1
+                # Telegram wants the whole bot to back off, not just this call
+                self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+                if attempt >= max_retries:
+                    raise
+                logger.warning("Flood limit hit on %s; pausing sends for %.1fs", endpoint, seconds)
+                attempt += 1
+                self.retries += 1
+
+    async def _take(self, chat_id: ChatId) -> None:
+        # Chat first, so a busy chat waits without holding a global token
+        buckets = self.group_buckets if is_group(chat_id) else self.chat_buckets
+        waited = False
+        for bucket, key in ((buckets, chat_id), (self.global_bucket, None)):
+            delay = max(bucket.reserve(key, time.monotonic()), self.paused_until - time.monotonic())
+            if delay > 0:
+                waited = True
+                await asyncio.sleep(delay)
+        # A RetryAfter that arrived while this call waited still applies to it
+        while self.paused_until > time.monotonic():
+            waited = True
+            await asyncio.sleep(self.paused_until - time.monotonic())
+        if waited:
+            self.delayed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "delayed": self.delayed,
+            "flood_waits": self.flood_waits,
+            "retries": self.retries,
+            "tracked_chats": len(self.chat_buckets) + len(self.group_buckets),
+        }
+
+class _Outgoing:
+    """One queued message and the future its sender awaits."""
+
+    __slots__ = ("bot", "chat_id", "text", "photo", "caption", "parse_mode", "kwargs", "future")
+
+    def __init__(self, bot: Bot, chat_id: ChatId, text: Optional[str], photo: Optional[str], caption: Optional[str], parse_mode: Optional[str], kwargs: Dict[str, Any]):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.text = text
+        self.photo = photo
+        self.caption = caption
+        self.parse_mode = parse_mode
+        self.kwargs = kwargs
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Failures are logged by the queue; a sender that does not wait must not trigger
+        # "exception was never retrieved"
+        self.future.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    @property
+    def groupable(self) -> bool:
+        # Media groups cannot carry a keyboard or other per-message options
+        return self.photo is not None and not self.kwargs
+
+class DeliveryQueue:
+    """Per-chat FIFO queues drained round-robin, with photos batched into media groups.
+
+    Sends go through ``limiter`` when one is given; leave it out when the
+    bot already has a ``rate_limiter``, or every send is paced twice.
+    """
+
+    def __init__(self, workers: int = DELIVERY_WORKERS, max_pending: int = DELIVERY_MAX_PENDING, max_group: int = MEDIA_GROUP_MAX, limiter: Optional[FloodLimiter] = None):
+        self.workers = workers
+        self.limiter = limiter
+        self.max_pending = max_pending
+        self.max_group = max_group
+        self._chats: Dict[ChatId, Deque[_Outgoing]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._room: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending = 0
+        self.messages = 0
+        self.api_calls = 0
+        self.media_groups = 0
+        self.failed = 0
+
+    # Sending
+
+    async def send_message(self, bot: Bot, chat_id: ChatId, text: str, wait: bool = True, parse_mode: Optional[str] = None, **kwargs: Any) -> Optional[Message]:
+        """Queue a text message; with ``wait``, return it once sent (or raise the send error)."""
+        outgoing = await self._put(_Outgoing(bot, chat_id, text, None, None, parse_mode, kwargs))
+        return await outgoing.future if wait else None
+
+    async def send_photo(self, bot: Bot, chat_id: ChatId, photo: str, caption: Optional[str] = None, wait: bool = True, parse_mode: Optional[str] = None, **kwargs: Any) -> Optional[Message]:
+        """Queue a photo; it joins a media group with photos queued next to it."""
+        outgoing = await self._put(_Outgoing(bot, chat_id, None, photo, caption, parse_mode, kwargs))
+        return await outgoing.future if wait else None
+
+    async def send_photos(self, bot: Bot, chat_id: ChatId, photos: Sequence[Tuple[str, Optional[str]]], wait: bool = True, parse_mode: Optional[str] = None) -> Optional[List[Message]]:
+        """Queue ``(photo, caption)`` pairs back to back, so they go out in media groups."""
+        queued = [await self._put(_Outgoing(bot, chat_id, None, photo, caption, parse_mode, {})) for photo, caption in photos]
+        if not wait:
+            return None
+        return list(await asyncio.gather(*(outgoing.future for outgoing in queued)))
+
+    async def flush(self) -> None:
+        """Wait until every queued message has been sent or has failed."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def stop(self, timeout: float = DELIVERY_DRAIN_TIMEOUT) -> None:
+        """Send what is queued (for up to ``timeout`` seconds), then stop the senders."""
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d undelivered messages at shutdown", self.pending)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for queue in self._chats.values():
+            for outgoing in queue:
+                outgoing.future.cancel()
+        self._tasks = []
+        self._chats = {}
+        self._loop = None
+        self.pending = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self.pending,
+            "messages": self.messages,
+            "api_calls": self.api_calls,
+            "media_groups": self.media_groups,
+            "failed": self.failed,
+        }
+
+    # Internals
+
+    def _start(self) -> None:
+        # Senders start with the first message, on the loop that queued it
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._chats = {}
+        self._ready = asyncio.Queue()
+        self._room = asyncio.Semaphore(self.max_pending)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.pending = 0
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _put(self, outgoing: _Outgoing) -> _Outgoing:
+        self._start()
+        await self._room.acquire()
+        self.pending += 1
+        self._idle.clear()
+        queue = self._chats.get(outgoing.chat_id)
+        if queue is None:
+            # A chat is on the ready queue only while it has messages and no sender
+            queue = self._chats[outgoing.chat_id] = deque()
+            self._ready.put_nowait(outgoing.chat_id)
+        queue.append(outgoing)
+        return outgoing
+
+    def _take_batch(self, queue: Deque[_Outgoing]) -> List[_Outgoing]:
+        batch = [queue.popleft()]
+        if batch[0].groupable:
+            while queue and len(batch) < self.max_group and queue[0].groupable:
+                batch.append(queue.popleft())
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._chats[chat_id]
+            batch = self._take_batch(queue)
+            try:
+                await self._send(batch)
+            finally:
+                # Back of the line, so other chats get a turn between this chat's batches
+                if queue:
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._chats[chat_id]
+                for _ in batch:
+                    self._room.release()
+                self.pending -= len(batch)
+                if not self.pending:
+                    self._idle.set()
+
+    async def _send(self, batch: List[_Outgoing]) -> None:
+        first = batch[0]
+        self.api_calls += 1
+        try:
+            if len(batch) > 1:
+                media = [InputMediaPhoto(outgoing.photo, caption=outgoing.caption, parse_mode=outgoing.parse_mode) for outgoing in batch]
+                results = list(await self._paced(first.chat_id, "sendMediaGroup", lambda: first.bot.send_media_group(first.chat_id, media)))
+                self.media_groups += 1
+            elif first.photo is not None:
+                results = [await self._paced(first.chat_id, "sendPhoto", lambda: first.bot.send_photo(first.chat_id, first.photo, caption=first.caption, parse_mode=first.parse_mode, **first.kwargs))]
+            else:
+                results = [await self._paced(first.chat_id, "sendMessage", lambda: first.bot.send_message(first.chat_id, first.text, parse_mode=first.parse_mode, **first.kwargs))]
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning("Failed to deliver %d message(s) to chat %s: %s", len(batch), first.chat_id, e)
+            for outgoing in batch:
+                if not outgoing.future.done():
+                    outgoing.future.set_exception(e)
+            return
+        self.messages += len(batch)
+        for outgoing, result in zip(batch, results):
+            if not outgoing.future.done():
+                outgoing.future.set_result(result)
+
+    async def _paced(self, chat_id: ChatId, endpoint: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        if self.limiter is None:
+            return await send()
+        return await self.limiter.call(chat_id, send, endpoint)
+
+# Shared queue for fan-out sends; the only place the bot waits for flood limits
+delivery = DeliveryQueue(limiter=FloodLimiter())
@@ -1,11 +1,20 @@
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ConversationHandler, MessageHandler, filters
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, ConversationHandler, MessageHandler, filters
 from dotenv import load_dotenv
+import asyncio
 import os 
+from api_client import api_client
+from bot_metrics import MetricsReporter, instrument
+from conversation_state import CONTEXT_TYPES, ConversationSweeper
+from delivery import delivery
+from persistence import BOT_STATE_DB, SQLitePersistence
+from update_processor import PerUserUpdateProcessor
+import webhook
 from commands.startcommand import start_handler
 from commands.editcommand import edit_handler
 from commands.deletecommand import delete_handler
 from commands.showcommand import show_handler
+from commands.matchcommand import match_handler
 
 import logging
 
@@ -18,6 +27,12 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Periodic handler/API latency summary and optional local /metrics endpoint
+metrics_reporter = MetricsReporter()
+
+# Ends idle conversations and frees their state (see conversation_state.py)
+conversation_sweeper = ConversationSweeper([start_handler, edit_handler, delete_handler])
+
 load_dotenv()
 
 # Bot Token
@@ -25,19 +40,63 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if TELEGRAM_BOT_TOKEN is None:
     raise ValueError("TELEGRAM_BOT_TOKEN environment variable is not set.")
 
+# Updates handled at once; above 1, different users run in parallel and each user's updates stay in order
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "1"))
+
+# "polling" (getUpdates loop) or "webhook" (Telegram POSTs updates, see webhook.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+
+async def post_init(application: Application) -> None:
+    """Open the shared backend HTTP client and start metrics reporting once the Application is initialized."""
+    await api_client.start()
+    await metrics_reporter.start()
+    await conversation_sweeper.start(application)
+
+async def post_shutdown(application: Application) -> None:
+    """Send queued messages, log final metrics and close the shared backend HTTP client on shutdown."""
+    await conversation_sweeper.stop()
+    await delivery.stop()
+    logger.info("Delivery stats: %s, rate limiter: %s", delivery.stats(), delivery.limiter.stats())
+    logger.info("Backend client stats: %s", api_client.stats())
+    await metrics_reporter.stop()
+    await api_client.close()
+
 def main() -> None:
     """Run the bot."""
     # Create the Application and pass it your bot's token.
-    app = ApplicationBuilder().token(str(TELEGRAM_BOT_TOKEN)).build()
+    processor = PerUserUpdateProcessor(BOT_CONCURRENT_UPDATES)
+    builder = (
+        ApplicationBuilder()
+        .token(str(TELEGRAM_BOT_TOKEN))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(processor)
+        # Typed per-user state instead of a dict per user
+        .context_types(CONTEXT_TYPES)
+    )
+    if BOT_STATE_DB:
+        # In-progress conversations survive restarts (write-behind, see persistence.py)
+        builder = builder.persistence(SQLitePersistence(BOT_STATE_DB))
+    if BOT_MODE == "webhook":
+        # No getUpdates loop; the webhook server feeds a bounded queue
+        builder = builder.updater(None).update_queue(webhook.bounded_update_queue(processor))
+    else:
+        # Updates beyond the processor's max_pending wait in the queue, not as tasks
+        builder = builder.update_queue(processor.update_queue())
+    app = builder.build()
 
-    # Add handlers
-    app.add_handler(start_handler)
-    app.add_handler(edit_handler)
-    app.add_handler(delete_handler)
-    app.add_handler(show_handler)
+    # Add handlers, each timed per command and conversation state
+    app.add_handler(instrument(start_handler))
+    app.add_handler(instrument(edit_handler))
+    app.add_handler(instrument(delete_handler))
+    app.add_handler(instrument(show_handler))
+    app.add_handler(instrument(match_handler))
 
     # Run the bot until the user presses Ctrl-C
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    if BOT_MODE == "webhook":
+        asyncio.run(webhook.serve(app))
+    else:
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""Write-behind persistence of conversation state in a local SQLite file.
+
+``SQLitePersistence`` keeps each conversation's state and each user's
+``UserState`` (see ``conversation_state.py``) in ``BOT_STATE_DB``, a SQLite
+database in WAL mode, so a restart resumes every conversation where it
+stopped. PTB hands over the changes every ``BOT_STATE_FLUSH_INTERVAL``
+seconds; they are buffered and written in one transaction on a worker
+thread, never one write per update. A crash therefore loses at most one
+interval. Setting ``BOT_STATE_DB`` to an empty string turns persistence off
+(``PERSISTENT`` is then false for the conversation handlers).
+"""
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from conversation_state import UserState
+
+logger = logging.getLogger(__name__)
+
+BOT_STATE_DB = os.getenv("BOT_STATE_DB", "bot_state.sqlite3")
+BOT_STATE_FLUSH_INTERVAL = float(os.getenv("BOT_STATE_FLUSH_INTERVAL", "5"))
+# Conversation handlers only persist when there is a database to persist to
+PERSISTENT = bool(BOT_STATE_DB)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS conversations (name TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, PRIMARY KEY (name, key)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS user_states (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)",
+)
+
+class SQLitePersistence(BasePersistence[UserState, Dict[Any, Any], Dict[Any, Any]]):
+    """Stores conversations and ``user_data``; chat, bot and callback data are not used by the bot."""
+
+    def __init__(self, path: str = BOT_STATE_DB, flush_interval: float = BOT_STATE_FLUSH_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=flush_interval,
+        )
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        # Changes waiting for the next write; None deletes the row
+        self._users: Dict[int, Optional[UserState]] = {}
+        self._conversations: Dict[Tuple[str, str], Optional[object]] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self.transactions = 0
+        self.rows_written = 0
+
+    # Loading (once, when the Application initializes)
+
+    async def get_user_data(self) -> Dict[int, UserState]:
+        rows = await asyncio.to_thread(self._select, "SELECT user_id, data FROM user_states")
+        return {user_id: UserState.from_dict(json.loads(data)) for user_id, data in rows}
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[Any, ...], object]:
+        rows = await asyncio.to_thread(self._select, "SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    # Buffered changes
+
+    async def update_user_data(self, user_id: int, data: UserState) -> None:
+        self._users[user_id] = None if data.is_empty else data
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._users[user_id] = None
+        self._schedule_write()
+
+    async def update_conversation(self, name: str, key: Tuple[Any, ...], new_state: Optional[object]) -> None:
+        self._conversations[(name, json.dumps(list(key)))] = new_state
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id: int, user_data: UserState) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Write everything still buffered and close the database (called on shutdown)."""
+        if self._writer is not None:
+            await self._writer
+        await self._write_pending()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    # Internals
+
+    def _schedule_write(self) -> None:
+        # PTB hands over a pass's changes in one go; the writer runs after them and takes them all
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        while self._users or self._conversations:
+            users, self._users = self._users, {}
+            conversations, self._conversations = self._conversations, {}
+            try:
+                await asyncio.to_thread(self._write, users, conversations)
+            except sqlite3.Error:
+                logger.exception("Failed to persist %d user states and %d conversations", len(users), len(conversations))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            # WAL keeps the file consistent on power loss; NORMAL only risks the last transaction
+            connection.execute("PRAGMA synchronous = NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _select(self, query: str, parameters: Tuple[Any, ...] = ()) -> list:
+        return self._connect().execute(query, parameters).fetchall()
+
+    def _write(self, users: Dict[int, Optional[UserState]], conversations: Dict[Tuple[str, str], Optional[object]]) -> None:
+        upserts = [(user_id, json.dumps(state.to_dict())) for user_id, state in users.items() if state is not None]
+        deletes = [(user_id,) for user_id, state in users.items() if state is None]
+        states = [(name, key, json.dumps(state)) for (name, key), state in conversations.items() if state is not None]
+        ended = [(name, key) for (name, key), state in conversations.items() if state is None]
+        connection = self._connect()
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO user_states (user_id, data) VALUES (?, ?)", upserts)
+            connection.executemany("DELETE FROM user_states WHERE user_id = ?", deletes)
+            connection.executemany("INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)", states)
+            connection.executemany("DELETE FROM conversations WHERE name = ? AND key = ?", ended)
+        self.transactions += 1
+        self.rows_written += len(users) + len(conversations)
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+import time
+
+# Sentinel stored for usernames the backend reported as not registered
+NOT_REGISTERED = object()
+
+class ProfileCache:
+    """Bounded LRU cache of user profiles keyed by Telegram username.
+
+    Entries expire after ``ttl`` seconds; "not registered" answers are cached
+    separately for ``negative_ttl`` seconds so repeated /start calls from new
+    users do not hit the backend. Expired profiles keep their ETag so they can
+    be revalidated with ``If-None-Match`` instead of refetched. A ``max_size``
+    of 0 disables caching.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, negative_ttl: float = 10.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any, Optional[str]]]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.revalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, telegram_username: str) -> Any:
+        """Return the cached profile, ``NOT_REGISTERED``, or ``None`` on a miss."""
+        entry = self._entries.get(telegram_username)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, etag = entry
+        if expires_at <= time.monotonic():
+            # Keep expired profiles that can be revalidated by ETag
+            if etag is None:
+                del self._entries[telegram_username]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(telegram_username)
+        if value is NOT_REGISTERED:
+            self.negative_hits += 1
+            return NOT_REGISTERED
+        self.hits += 1
+        return dict(value)
+
+    def put(self, telegram_username: str, profile: Dict[str, Any], etag: Optional[str] = None) -> None:
+        """Store a profile returned by the backend, with its ETag if any."""
+        self._store(telegram_username, dict(profile), self.ttl, etag)
+
+    def put_not_registered(self, telegram_username: str) -> None:
+        """Remember that the backend has no profile for this username."""
+        self._store(telegram_username, NOT_REGISTERED, self.negative_ttl)
+
+    def validator(self, telegram_username: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """``(etag, profile)`` of a stored profile, fresh or expired, if it has an ETag."""
+        entry = self._entries.get(telegram_username)
+        if entry is None or entry[2] is None:
+            return None
+        return entry[2], entry[1]
+
+    def revalidated(self, telegram_username: str) -> Optional[Dict[str, Any]]:
+        """The backend answered 304: renew the stored profile's TTL and return it."""
+        found = self.validator(telegram_username)
+        if found is None:
+            return None
+        etag, profile = found
+        self.revalidations += 1
+        self._store(telegram_username, profile, self.ttl, etag)
+        return dict(profile)
+
+    def invalidate(self, telegram_username: str) -> None:
+        self._entries.pop(telegram_username, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for sizing the cache under real traffic."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "revalidations": self.revalidations,
+        }
+
+    def _store(self, telegram_username: str, value: Any, ttl: float, etag: Optional[str] = None) -> None:
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        self._entries[telegram_username] = (time.monotonic() + ttl, value, etag)
+        self._entries.move_to_end(telegram_username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,145 @@
+"""Building blocks that keep the bot responsive when the backend is slow or down.
+
+``SingleFlight`` shares one in-flight call between identical reads,
+``CircuitBreaker`` fails fast after repeated backend failures, ``Bulkhead``
+caps in-flight and waiting requests so coroutines cannot pile up behind a
+slow backend, and ``backoff_delay`` gives full-jitter exponential backoff.
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class BackendUnavailable(httpx.HTTPError):
+    """Request not sent: the circuit is open or too many requests are waiting."""
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for retry number ``attempt`` (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds from a numeric ``Retry-After`` header, if any."""
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller starts the call as a task; later callers with the same
+    key await that task until it finishes. Cancelling one waiter does not
+    cancel the call for the others. ``enabled=False`` runs every call on its
+    own.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await fn()
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(call)
+
+    def _forget(self, key: Hashable, done: asyncio.Future) -> None:
+        if self._calls.get(key) is done:
+            del self._calls[key]
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, ``check`` raises ``BackendUnavailable``, except for one probe
+    request every ``reset_timeout`` seconds (half-open). Calls made while the
+    probe is in flight are rejected too, without waiting for it. A successful
+    probe closes the circuit; a failed one keeps it open for another interval.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def check(self) -> None:
+        if self.opened_at is None:
+            return
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_timeout:
+            # Let this request through as the probe; the interval restarts, so calls
+            # made while it is in flight are rejected rather than waiting for it
+            self.opened_at = now
+            return
+        self.rejected += 1
+        raise BackendUnavailable("Backend circuit is open")
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Backend circuit closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None:
+            self.opened_at = time.monotonic()
+        elif self.failure_threshold > 0 and self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.opens += 1
+            logger.warning("Backend circuit opened after %d consecutive failures", self.failures)
+
+class Bulkhead:
+    """At most ``max_in_flight`` requests at once and ``max_waiting`` queued for a slot.
+
+    Extra requests are rejected immediately, and a queued request gives up
+    after ``wait_timeout`` seconds, so a slow backend sheds load instead of
+    accumulating coroutines.
+    """
+
+    def __init__(self, max_in_flight: int, max_waiting: int, wait_timeout: float):
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.waiting = 0
+        self.rejected = 0
+
+    async def __aenter__(self) -> None:
+        if self._slots.locked():
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise BackendUnavailable("Too many backend requests waiting")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise BackendUnavailable("Timed out waiting for a backend request slot") from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+
+    async def __aexit__(self, *exc) -> None:
+        self._slots.release()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The bot modules import each other as top-level modules (``import webhook``)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Conversation state stays in memory
+os.environ.setdefault("BOT_STATE_DB", "")
@@ -0,0 +1,47 @@
+import asyncio
+
+from update_processor import PerUserUpdateProcessor
+
+
+def test_current_concurrent_updates_counts_running_handlers():
+    async def run():
+        processor = PerUserUpdateProcessor(2)
+        release = asyncio.Event()
+        seen = []
+
+        async def handler():
+            seen.append(processor.current_concurrent_updates)
+            await release.wait()
+
+        # Updates without a user or chat only take a slot
+        tasks = [asyncio.create_task(processor.process_update(object(), handler())) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        running = processor.current_concurrent_updates
+        release.set()
+        await asyncio.gather(*tasks)
+        return running, seen, processor.current_concurrent_updates
+
+    running, seen, after = asyncio.run(run())
+    assert running == 2
+    assert max(seen) == 2
+    assert after == 0
+
+
+def test_update_queue_holds_back_updates_beyond_max_pending():
+    async def run():
+        queue = PerUserUpdateProcessor(1, max_pending=2).update_queue()
+        for i in range(5):
+            queue.put_nowait(i)
+        taken = [await queue.get(), await queue.get()]
+        blocked = asyncio.create_task(queue.get())
+        await asyncio.sleep(0.01)
+        was_blocked = not blocked.done()
+        queue.task_done()
+        third = await asyncio.wait_for(blocked, 1)
+        return taken, was_blocked, third, queue.qsize()
+
+    taken, was_blocked, third, left = asyncio.run(run())
+    assert taken == [0, 1]
+    assert was_blocked
+    assert third == 2
+    assert left == 2
@@ -0,0 +1,51 @@
+import pytest
+from starlette.testclient import TestClient
+from telegram.ext import ApplicationBuilder
+
+import webhook
+from update_processor import PerUserUpdateProcessor
+
+SECRET = "test-secret"
+HEADERS = {webhook.SECRET_HEADER: SECRET}
+UPDATE = b'{"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "hi"}}'
+
+
+@pytest.fixture
+def client():
+    processor = PerUserUpdateProcessor(1)
+    application = ApplicationBuilder().token("123:test").updater(None).update_queue(webhook.bounded_update_queue(processor, 10)).build()
+    with TestClient(webhook.create_app(application, SECRET, max_body=1024)) as client:
+        client.queue = application.update_queue
+        yield client
+
+
+def test_update_is_queued(client):
+    response = client.post(webhook.WEBHOOK_PATH, content=UPDATE, headers=HEADERS)
+    assert response.status_code == 200
+    assert client.queue.qsize() == 1
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1.5"])
+def test_malformed_content_length_is_400(client, length):
+    response = client.post(webhook.WEBHOOK_PATH, content=UPDATE, headers={**HEADERS, "Content-Length": length})
+    assert response.status_code == 400
+
+
+def test_declared_oversized_body_is_413(client):
+    response = client.post(webhook.WEBHOOK_PATH, content=b"x" * 2048, headers=HEADERS)
+    assert response.status_code == 413
+
+
+def test_oversized_chunked_body_is_413(client):
+    def chunks():
+        for _ in range(8):
+            yield b"x" * 512
+
+    response = client.post(webhook.WEBHOOK_PATH, content=chunks(), headers=HEADERS)
+    assert response.status_code == 413
+    assert client.queue.qsize() == 0
+
+
+def test_small_chunked_body_is_accepted(client):
+    response = client.post(webhook.WEBHOOK_PATH, content=iter([UPDATE[:40], UPDATE[40:]]), headers=HEADERS)
+    assert response.status_code == 200
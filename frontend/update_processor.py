@@ -0,0 +1,119 @@
+import asyncio
+from typing import Any, Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class PendingLimitedQueue(asyncio.Queue):
+    """Update queue whose ``get`` waits while ``max_pending`` taken updates are unfinished.
+
+    An update counts from the moment it is taken until its ``task_done``,
+    which the Application calls once the update has been processed.
+    """
+
+    def __init__(self, max_pending: int, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.max_pending = max_pending
+        self.taken = 0
+        self._room = asyncio.Event()
+        self._room.set()
+
+    async def get(self) -> Any:
+        while self.taken >= self.max_pending:
+            self._room.clear()
+            await self._room.wait()
+        # Queue.get takes the item through get_nowait, which counts it
+        return await super().get()
+
+    def get_nowait(self) -> Any:
+        item = super().get_nowait()
+        self.taken += 1
+        return item
+
+    def task_done(self) -> None:
+        super().task_done()
+        self.taken -= 1
+        if self.taken < self.max_pending:
+            self._room.set()
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates from different users concurrently, each user's in order.
+
+    At most ``max_concurrent_updates`` handlers run at once. Updates from the
+    same user (or chat, for updates without a user) wait on that user's FIFO
+    lock before taking a processing slot, so a user's conversation state is
+    never touched by two updates at the same time and a burst from one user
+    cannot occupy slots other users need.
+
+    PTB starts a task for every update it takes off the update queue, so
+    ``max_pending`` (running or waiting for a lock or slot) only holds when
+    the Application uses ``update_queue()``: its ``get`` waits until fewer
+    than ``max_pending`` taken updates are unfinished, and the rest stay in
+    the queue.
+    """
+
+    __slots__ = ("_limit", "_slots", "_running", "_locks", "max_pending")
+
+    def __init__(self, max_concurrent_updates: int, max_pending: Optional[int] = None):
+        self._limit = max_concurrent_updates
+        self.max_pending = max_pending or 64 * max_concurrent_updates
+        super().__init__(self.max_pending)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # Handlers holding a slot right now
+        self._running = 0
+        # Per-key lock and the number of updates holding or waiting for it
+        self._locks: Dict[Any, List] = {}
+
+    def update_queue(self, maxsize: int = 0) -> "PendingLimitedQueue":
+        """The Application's update queue, holding back updates beyond ``max_pending``."""
+        return PendingLimitedQueue(self.max_pending, maxsize)
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._limit
+
+    @property
+    def current_concurrent_updates(self) -> int:
+        return self._running
+
+    @staticmethod
+    def ordering_key(update: object) -> Any:
+        if isinstance(update, Update):
+            if update.effective_user is not None:
+                return ("user", update.effective_user.id)
+            if update.effective_chat is not None:
+                return ("chat", update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._slots:
+                await self._run(coroutine)
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._slots:
+                    await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        self._running += 1
+        try:
+            await coroutine
+        finally:
+            self._running -= 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
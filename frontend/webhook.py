@@ -0,0 +1,142 @@
+"""Webhook ingestion: Telegram POSTs updates to us instead of being polled.
+
+``create_app`` builds a small Starlette app that checks Telegram's
+``X-Telegram-Bot-Api-Secret-Token`` header, decodes the update and puts it on
+the Application's (bounded) update queue. The queue only drains as fast as
+the update processor frees room for more (``bounded_update_queue``), so it
+also fills up when updates are handled concurrently. When it stays full for
+``WEBHOOK_ENQUEUE_TIMEOUT`` seconds the request is answered with 503 and
+``Retry-After``; Telegram redelivers the update later, so a slow bot sheds
+load upstream instead of buffering without limit. ``serve`` registers the
+webhook and runs the app under uvicorn on the Application's event loop.
+"""
+from typing import Optional
+import asyncio
+import hmac
+import json
+import logging
+import os
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+from update_processor import PendingLimitedQueue, PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Public HTTPS URL Telegram should POST to (must end with WEBHOOK_PATH)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# Shared secret Telegram echoes in every request (1-256 chars of A-Z, a-z, 0-9, _ and -)
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Updates buffered between the HTTP server and the handlers
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# How long a request may wait for queue space before it is refused
+WEBHOOK_ENQUEUE_TIMEOUT = float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", "1"))
+# Simultaneous connections Telegram may open to the webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Largest request body accepted; real updates are a few KB
+WEBHOOK_MAX_BODY = 1 << 20
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def create_app(
+    application: Application,
+    secret_token: str,
+    path: str = WEBHOOK_PATH,
+    enqueue_timeout: float = WEBHOOK_ENQUEUE_TIMEOUT,
+    max_body: int = WEBHOOK_MAX_BODY,
+) -> Starlette:
+    """Starlette app that feeds POSTed updates into ``application.update_queue``."""
+    expected = secret_token.encode()
+    queue = application.update_queue
+
+    async def receive_update(request: Request) -> Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), expected):
+            return Response(status_code=403)
+        try:
+            declared = int(request.headers.get("content-length") or 0)
+        except ValueError:
+            return Response(status_code=400)
+        if declared < 0:
+            return Response(status_code=400)
+        if declared > max_body:
+            return Response(status_code=413)
+        # Chunked bodies carry no length up front, so count while reading
+        body = bytearray()
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > max_body:
+                return Response(status_code=413)
+        try:
+            update = Update.de_json(json.loads(body), application.bot)
+        except (ValueError, TypeError, KeyError):
+            return Response(status_code=400)
+
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(queue.put(update), enqueue_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Update queue full (%d), refusing update %s", queue.qsize(), update.update_id)
+                return Response(status_code=503, headers={"Retry-After": "1"})
+        return Response(status_code=200)
+
+    async def health(request: Request) -> Response:
+        return JSONResponse({"queued": queue.qsize(), "max_queued": queue.maxsize})
+
+    return Starlette(routes=[
+        Route(path, receive_update, methods=["POST"]),
+        Route("/healthz", health, methods=["GET"]),
+    ])
+
+async def serve(
+    application: Application,
+    url: Optional[str] = WEBHOOK_URL,
+    secret_token: Optional[str] = WEBHOOK_SECRET_TOKEN,
+    listen: str = WEBHOOK_LISTEN,
+    port: int = WEBHOOK_PORT,
+    path: str = WEBHOOK_PATH,
+) -> None:
+    """Run ``application`` in webhook mode until the server is stopped (SIGINT/SIGTERM)."""
+    if not secret_token:
+        raise ValueError("WEBHOOK_SECRET_TOKEN environment variable is not set.")
+
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(application, secret_token, path),
+        host=listen,
+        port=port,
+        log_level="warning",
+        access_log=False,
+    ))
+    async with application:
+        if application.post_init is not None:
+            await application.post_init(application)
+        if url:
+            await application.bot.set_webhook(
+                url=url,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+        await application.start()
+        try:
+            await server.serve()
+        finally:
+            await application.stop()
+            if application.post_stop is not None:
+                await application.post_stop(application)
+    if application.post_shutdown is not None:
+        await application.post_shutdown(application)
+
+def bounded_update_queue(processor: PerUserUpdateProcessor, maxsize: int = WEBHOOK_QUEUE_SIZE) -> PendingLimitedQueue:
+    """``maxsize`` updates beyond the ``processor.max_pending`` being handled, then 503s."""
+    return processor.update_queue(maxsize)